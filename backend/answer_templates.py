@@ -0,0 +1,70 @@
+import os
+from decimal import Decimal
+
+from result_summary import display_value
+from telemetry import template_answers
+
+
+# Per-deployment switch: answer simple result shapes locally, no LLM call
+TEMPLATE_ANSWERS_ENABLED = os.getenv("TEMPLATE_ANSWERS_ENABLED", "1") == "1"
+TEMPLATE_MAX_ROW_COLUMNS = 6     # widest single row answered from a template
+TEMPLATE_MAX_LABEL_ROWS = 10     # largest label / value set answered from a template
+
+
+def column_label(name: str) -> str:
+    # "customers_count" -> "Customers count"
+    label = name.replace("_", " ").strip()
+    return label[:1].upper() + label[1:]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def template_answer(columns, rows, total_rows: int | None):
+    """
+    Insight bullets for result shapes that need no explaining:
+
+    - a single scalar              [(42,)]
+    - a single, narrow row         [("Berlin", 12, 3.5)]
+    - a small label / value set    [("Germany", 42), ("France", 17)]
+
+    Returns None for anything else (wide, large, truncated results), which
+    then goes to the LLM. Hits and misses are counted.
+    """
+    answer = _template_answer(list(columns), rows, total_rows)
+    template_answers.inc(result="miss" if answer is None else "hit")
+    return answer
+
+
+def _template_answer(columns, rows, total_rows):
+    # truncated results need the LLM's judgement
+    if not rows or total_rows is None or total_rows != len(rows):
+        return None
+
+    if len(rows) == 1 and len(columns) == 1:
+        return f"- **{column_label(columns[0])}**: {display_value(rows[0][0])}"
+
+    if len(rows) == 1 and len(columns) <= TEMPLATE_MAX_ROW_COLUMNS:
+        return "\n".join(
+            f"- **{column_label(col)}**: {display_value(value)}"
+            for col, value in zip(columns, rows[0])
+        )
+
+    if len(columns) == 2 and len(rows) <= TEMPLATE_MAX_LABEL_ROWS:
+        if not all(_is_number(row[1]) for row in rows):
+            return None
+
+        # the table above already lists every value; point out the extremes
+        measure = column_label(columns[1]).lower()
+        highest = max(rows, key=lambda row: row[1])
+        lowest = min(rows, key=lambda row: row[1])
+        lines = [f"- {len(rows)} rows by {column_label(columns[0]).lower()}"]
+        if highest[1] == lowest[1]:
+            lines.append(f"- All share the same {measure}: {display_value(highest[1])}")
+        else:
+            lines.append(f"- Highest {measure}: {display_value(highest[0])} ({display_value(highest[1])})")
+            lines.append(f"- Lowest {measure}: {display_value(lowest[0])} ({display_value(lowest[1])})")
+        return "\n".join(lines)
+
+    return None
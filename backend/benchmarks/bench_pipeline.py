@@ -0,0 +1,422 @@
+"""
+Offline end-to-end benchmark of the chat pipeline (no LLM provider needed).
+
+Calls the real chat_message endpoint (title, schema load, trim, prune,
+SQL generation, validation, row stream, answer stream) against a generated
+SQLite database, with a scripted stub LLM of configurable latency, and
+consumes the streamed frames like a client would. Reports p50/p95/p99 per
+stage, time to the first rows frame and requests/sec for N concurrent
+clients. The auth database and schema caches live in a temporary folder.
+
+Run from the backend folder:
+    python -m benchmarks.bench_pipeline --clients 8 --requests 20 \
+        --tables 200 --rows 50000 --llm-latency 0.05 --output bench.json
+
+--no-cache turns off the SQL and result caches, so repeated questions
+measure generation and execution instead of cache hits.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+from cryptography.fernet import Fernet
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
+
+from schema_serializer import estimate_tokens
+from stream_frames import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
+from telemetry import RequestTrace
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ACCEPT = {
+    "ndjson": NDJSON_MEDIA_TYPE,
+    "sse": SSE_MEDIA_TYPE,
+    "text": "text/plain",
+}
+
+# question -> SQL the stub LLM "generates" for it
+SCRIPT = {
+    "how many customers are in Germany":
+        "SELECT COUNT(*) AS customers_count FROM customers "
+        "WHERE customers.country = 'Germany'",
+    "total order value by customer country":
+        "SELECT customers.country AS customers_country, SUM(orders.total) AS orders_total "
+        "FROM orders JOIN customers ON orders.customer_id = customers.id "
+        "GROUP BY customers.country ORDER BY orders_total DESC",
+    "top products by quantity sold":
+        "SELECT products.name AS products_name, SUM(order_items.quantity) AS order_items_quantity "
+        "FROM order_items JOIN products ON order_items.product_id = products.id "
+        "GROUP BY products.name ORDER BY order_items_quantity DESC LIMIT 10",
+    "list the most recent orders":
+        "SELECT orders.id AS orders_id, orders.created_at AS orders_created_at, "
+        "orders.total AS orders_total FROM orders ORDER BY orders.created_at DESC",
+    "show all products in the toys category":
+        "SELECT products.name AS products_name, products.price AS products_price "
+        "FROM products WHERE products.category = 'toys'",
+}
+
+COUNTRIES = ["Germany", "France", "India", "Brazil", "Japan", "Canada", "Spain", "Kenya"]
+CATEGORIES = ["toys", "books", "garden", "music", "sports", "kitchen"]
+
+
+def build_sales_db(path: str, n_filler_tables: int, n_rows: int, seed: int = 7):
+    """
+    customers / products / orders / order_items sized by `n_rows`, plus
+    filler tables (FK chain) so schema handling sees a realistic width.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+
+    conn.executescript("""
+        CREATE TABLE customers (id INTEGER PRIMARY KEY, name TEXT, country TEXT, created_at TEXT);
+        CREATE TABLE products (id INTEGER PRIMARY KEY, name TEXT, category TEXT, price REAL);
+        CREATE TABLE orders (
+            id INTEGER PRIMARY KEY,
+            customer_id INTEGER REFERENCES customers(id),
+            total REAL,
+            created_at TEXT
+        );
+        CREATE TABLE order_items (
+            id INTEGER PRIMARY KEY,
+            order_id INTEGER REFERENCES orders(id),
+            product_id INTEGER REFERENCES products(id),
+            quantity INTEGER
+        );
+    """)
+
+    n_customers = max(n_rows // 10, 1)
+    n_products = max(n_rows // 50, 1)
+    conn.executemany(
+        "INSERT INTO customers VALUES (?, ?, ?, ?)",
+        ((i, f"customer {i}", rng.choice(COUNTRIES), f"2024-01-{i % 28 + 1:02d}")
+         for i in range(n_customers))
+    )
+    conn.executemany(
+        "INSERT INTO products VALUES (?, ?, ?, ?)",
+        ((i, f"product {i}", rng.choice(CATEGORIES), round(rng.uniform(1, 500), 2))
+         for i in range(n_products))
+    )
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?, ?)",
+        ((i, rng.randrange(n_customers), round(rng.uniform(5, 2000), 2),
+          f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}")
+         for i in range(n_rows))
+    )
+    conn.executemany(
+        "INSERT INTO order_items VALUES (?, ?, ?, ?)",
+        ((i, rng.randrange(n_rows), rng.randrange(n_products), rng.randint(1, 5))
+         for i in range(n_rows))
+    )
+
+    for i in range(n_filler_tables):
+        cols = ["id INTEGER PRIMARY KEY"] + [f"attr_{c} TEXT" for c in range(8)]
+        if i > 0:
+            cols.append(f"parent_id INTEGER REFERENCES filler_{i - 1}(id)")
+        conn.execute(f"CREATE TABLE filler_{i} ({', '.join(cols)})")
+
+    conn.commit()
+    conn.close()
+
+
+class StubMessage:
+    def __init__(self, content: str, input_tokens: int = 0, output_tokens: int = 0):
+        self.content = content
+        self.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+        }
+
+
+class StubLLM:
+    """
+    Scripted LangChain-style chat model: invoke / ainvoke / stream / astream.
+    Every call waits `latency` seconds (time to first token); streamed
+    answers then emit `answer_tokens` chunks `token_latency` apart.
+    """
+
+    def __init__(self, latency: float, token_latency: float, answer_tokens: int):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+
+    def _reply(self, prompt: str) -> str:
+        if "chat title" in prompt:
+            return "Benchmark question"
+        if "schema selection agent" in prompt:
+            # keep the schema as given, minus the format header
+            schema = prompt.split("Schema:", 1)[1].split("Question:", 1)[0]
+            return "\n".join(line for line in schema.strip().splitlines()
+                             if not line.startswith("#"))
+        for question, sql in SCRIPT.items():
+            if question in prompt:
+                return sql
+        return "SELECT 'NOT_ANSWERABLE';"
+
+    def _message(self, prompt: str, content: str) -> StubMessage:
+        return StubMessage(content, estimate_tokens(prompt), estimate_tokens(content))
+
+    def invoke(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        return self._message(prompt, self._reply(prompt))
+
+    async def ainvoke(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._message(prompt, self._reply(prompt))
+
+    def stream(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        for i in range(self.answer_tokens):
+            if i:
+                time.sleep(self.token_latency)
+            yield StubMessage(f" token{i}")
+
+    async def astream(self, prompt, **kwargs):
+        await asyncio.sleep(self.latency)
+        for i in range(self.answer_tokens):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield StubMessage(f" token{i}")
+
+
+class BenchTrace(RequestTrace):
+    """
+    RequestTrace that keeps every finished request's stages for the report.
+    """
+
+    finished = []
+
+    def log_summary(self, outcome: str):
+        super().log_summary(outcome)
+        BenchTrace.finished.append(dict(self.stages))
+
+
+def bench_request(session_id: int, accept: str) -> Request:
+    """
+    The HTTP request chat_message sees; the client never disconnects.
+    """
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": f"/chat/{session_id}/messages",
+        "query_string": b"",
+        "headers": [(b"accept", accept.encode())],
+    }
+    return Request(scope, receive)
+
+
+def setup_user(server, db_path: str):
+    """
+    A user owning the benchmark database; returns (user_id, db_id).
+    """
+    auth_db = server.AuthSessionLocal()
+    try:
+        user = server.User(username="bench", hashed_password=server.hash_password("bench"))
+        auth_db.add(user)
+        auth_db.commit()
+
+        uri = f"sqlite:///{db_path}"
+        db_conn = server.DatabaseConnection(
+            user_id=user.id,
+            name="bench",
+            dialect="sqlite",
+            connection_uri_enc=server.encrypt(uri),
+            connection_uri_hash=server.hash_uri(uri)
+        )
+        auth_db.add(db_conn)
+        auth_db.commit()
+        return user.id, db_conn.id
+    finally:
+        auth_db.close()
+
+
+async def run_request(server, user_id: int, db_id: int, question: str, accept: str):
+    """
+    One chat_message call in a fresh session (so the title stage runs too),
+    read to the end. Returns (seconds to the first rows frame or None, total seconds).
+    """
+    auth_db = server.AuthSessionLocal()
+    try:
+        chat_session = server.ChatSession(user_id=user_id, db_id=db_id)
+        auth_db.add(chat_session)
+        auth_db.commit()
+
+        start = time.perf_counter()
+        first_rows = None
+        response = await server.chat_message(
+            chat_session.id,
+            server.ChatMessageRequest(message=question),
+            bench_request(chat_session.id, accept),
+            auth_db=auth_db,
+            user_id=user_id
+        )
+
+        if isinstance(response, StreamingResponse):
+            async for chunk in response.body_iterator:
+                if isinstance(chunk, bytes):
+                    chunk = chunk.decode()
+                if '"type":"error"' in chunk:
+                    raise RuntimeError(chunk.strip())
+                if first_rows is None and '"type":"rows"' in chunk:
+                    first_rows = time.perf_counter() - start
+        if response.background is not None:
+            await response.background()
+
+        return first_rows, time.perf_counter() - start
+    finally:
+        auth_db.close()
+
+
+async def run_benchmark(server, user_id: int, db_id: int, clients: int,
+                        requests: int, seed: int, accept: str):
+    questions = list(SCRIPT)
+
+    # warm the schema cache / index / vectors, as a running server would be
+    await run_request(server, user_id, db_id, questions[0], accept)
+    BenchTrace.finished.clear()
+
+    first_rows = []
+    totals = []
+    errors = 0
+
+    async def client(client_id: int):
+        nonlocal errors
+        rng = random.Random(seed + client_id)
+        for _ in range(requests):
+            try:
+                first, total = await run_request(
+                    server, user_id, db_id, rng.choice(questions), accept
+                )
+            except Exception as e:
+                errors += 1
+                print("request failed:", repr(e))
+                continue
+            if first is not None:
+                first_rows.append(first)
+            totals.append(total)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    wall = time.perf_counter() - start
+
+    samples = {}
+    for stages in BenchTrace.finished:
+        for stage, seconds in stages.items():
+            samples.setdefault(stage, []).append(seconds)
+    samples["first_rows"] = first_rows
+    samples["total"] = totals
+
+    completed = len(totals)
+    return {
+        "completed": completed,
+        "errors": errors,
+        "wall_seconds": wall,
+        "requests_per_second": completed / wall if wall else 0.0,
+        "stages": {
+            stage: summarize(values) for stage, values in samples.items() if values
+        },
+    }
+
+
+def summarize(values):
+    ms = np.array(values) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(values),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    parser.add_argument("--tables", type=int, default=200, help="filler tables")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.005)
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--format", choices=sorted(ACCEPT), default="ndjson",
+                        help="stream format the client asks for")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="disable the SQL and result caches")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    args = parser.parse_args()
+
+    if args.no_cache:
+        os.environ["SQL_CACHE_ENABLED"] = "0"
+        os.environ["RESULT_CACHE_ENABLED"] = "0"
+    # the LLM client is replaced by the stub, but main builds one on import
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+    os.environ.setdefault("DB_SECRET_KEY", Fernet.generate_key().decode())
+
+    output = os.path.abspath(args.output) if args.output else None
+    cwd = os.getcwd()
+    sys.path.insert(0, BACKEND_DIR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # main opens data/auth.db (and the schema caches) relative to the working directory
+        os.chdir(tmp)
+        os.makedirs("data")
+        try:
+            import main as server
+
+            server.llm = StubLLM(args.llm_latency, args.token_latency, args.answer_tokens)
+            server.RequestTrace = BenchTrace
+
+            path = os.path.join(tmp, "bench.db")
+            build_sales_db(path, args.tables, args.rows, args.seed)
+            user_id, db_id = setup_user(server, path)
+            try:
+                results = asyncio.run(run_benchmark(
+                    server, user_id, db_id, args.clients, args.requests,
+                    args.seed, ACCEPT[args.format]
+                ))
+            finally:
+                server.engine_registry.dispose_all()
+                server.auth_engine.dispose()
+
+            results["config"] = vars(args)
+            results["config"]["prune_mode"] = server.SCHEMA_PRUNE_MODE
+            results["config"]["speculative"] = server.SQL_SPECULATIVE
+            results["config"]["sql_cache"] = server.SQL_CACHE_ENABLED
+            results["config"]["result_cache"] = server.RESULT_CACHE_ENABLED
+        finally:
+            os.chdir(cwd)
+
+    print(
+        f"{args.clients} clients x {args.requests} requests: "
+        f"{results['completed']} ok, {results['errors']} failed, "
+        f"{results['requests_per_second']:.1f} req/s"
+    )
+    print(f"{'stage':<16}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, stats in results["stages"].items():
+        print(
+            f"{stage:<16}{stats['p50_ms']:>10.1f}"
+            f"{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}"
+        )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print("results written to", output)
+
+
+if __name__ == "__main__":
+    main()
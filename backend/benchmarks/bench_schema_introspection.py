@@ -0,0 +1,82 @@
+"""
+Cold schema introspection benchmark on a synthetic SQLite database.
+
+Run from the backend folder:
+    python -m benchmarks.bench_schema_introspection --tables 1000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from schema_cache import (
+    introspect_schema,
+    introspect_schema_catalog,
+    introspect_schema_multi,
+    introspect_schema_per_table,
+)
+
+
+def build_synthetic_db(path: str, n_tables: int, n_columns: int = 8):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = OFF")
+
+    for i in range(n_tables):
+        cols = ["id INTEGER PRIMARY KEY"]
+        cols += [f"col_{c} TEXT" for c in range(n_columns)]
+        if i > 0:
+            cols.append(f"parent_id INTEGER REFERENCES table_{i - 1}(id)")
+        conn.execute(f"CREATE TABLE table_{i} ({', '.join(cols)})")
+
+    conn.commit()
+    conn.close()
+
+
+def time_cold(loader, uri: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        # fresh engine each run so no Inspector / pool state is reused
+        engine = create_engine(uri)
+        start = time.perf_counter()
+        schema = loader(engine)
+        timings.append(time.perf_counter() - start)
+        engine.dispose()
+    return min(timings), schema
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=1000)
+    parser.add_argument("--columns", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.db")
+        build_synthetic_db(path, args.tables, args.columns)
+        uri = f"sqlite:///{path}"
+
+        print(f"synthetic sqlite: {args.tables} tables x {args.columns + 1} columns")
+
+        baseline = None
+        loaders = (
+            introspect_schema_per_table,
+            introspect_schema_multi,
+            introspect_schema_catalog,
+            introspect_schema,
+        )
+        for loader in loaders:
+            seconds, schema = time_cold(loader, uri, args.repeat)
+            baseline = baseline or seconds
+            print(
+                f"{loader.__name__:<30} {seconds * 1000:9.1f} ms  "
+                f"x{baseline / seconds:5.2f}  "
+                f"tables={len(schema['tables'])} fks={len(schema['foreign_keys'])}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Schema trimming microbenchmark on a synthetic wide schema
+(defaults: 800 tables, ~25k columns).
+
+Run from the backend folder:
+    python -m benchmarks.bench_schema_trimmer --tables 800 --columns 31
+"""
+import argparse
+import random
+import time
+
+from schema_trimmer import (
+    SchemaIndex,
+    extract_keywords,
+    trim_schema_for_prompt,
+)
+
+
+WORDS = [
+    "sales", "order", "header", "detail", "customer", "product", "vendor",
+    "invoice", "payment", "shipment", "address", "region", "territory",
+    "employee", "department", "currency", "rate", "price", "discount",
+    "inventory", "warehouse", "location", "category", "status", "history",
+]
+
+QUESTIONS = [
+    "total sales by region last month",
+    "which customers have unpaid invoices",
+    "top products by discount in each category",
+    "employees per department and territory",
+    "average shipment delay per warehouse location",
+]
+
+
+def build_wide_schema(n_tables: int, n_columns: int, seed: int = 7):
+    rng = random.Random(seed)
+    tables = {}
+    foreign_keys = []
+
+    for i in range(n_tables):
+        name = "".join(w.capitalize() for w in rng.sample(WORDS, 2)) + str(i)
+        full_name = f"{rng.choice(['Sales', 'Production', 'Person', 'Purchasing'])}.{name}"
+        columns = [f"{name}ID"] + [
+            "".join(w.capitalize() for w in rng.sample(WORDS, 2)) + str(c)
+            for c in range(n_columns - 1)
+        ]
+        tables[full_name] = columns
+
+    names = list(tables)
+    for source in names:
+        for target in rng.sample(names, 2):
+            foreign_keys.append({
+                "source_table": source,
+                "source_column": tables[target][0],
+                "target_table": target,
+                "target_column": tables[target][0],
+            })
+
+    return {"tables": tables, "foreign_keys": foreign_keys}
+
+
+def match_tables_scan(tables: dict, keywords):
+    """
+    Unindexed keyword match (every table and column): the reference the
+    index is measured and checked against.
+    """
+    matched_tables = set()
+
+    for table, columns in tables.items():
+        table_lc = table.lower()
+
+        if any(k in table_lc for k in keywords):
+            matched_tables.add(table)
+            continue
+
+        for col in columns:
+            if any(k in col.lower() for k in keywords):
+                matched_tables.add(table)
+                break
+
+    return matched_tables
+
+
+def trim_schema_linear(full_schema: dict, question: str, max_tables: int = 15):
+    """
+    The original unindexed trimmer (keyword scan + one-hop FK expansion over
+    every foreign key), for an end-to-end comparison with the ranked trim.
+    """
+    tables = full_schema["tables"]
+    foreign_keys = full_schema["foreign_keys"]
+    matched_tables = match_tables_scan(tables, extract_keywords(question))
+
+    expanded_tables = set(matched_tables)
+    for fk in foreign_keys:
+        if fk["source_table"] in matched_tables:
+            expanded_tables.add(fk["target_table"])
+        if fk["target_table"] in matched_tables:
+            expanded_tables.add(fk["source_table"])
+
+    final_tables = list(expanded_tables)[:max_tables]
+    return {
+        "tables": {t: tables[t] for t in final_tables},
+        "foreign_keys": [
+            fk for fk in foreign_keys
+            if fk["source_table"] in final_tables
+            and fk["target_table"] in final_tables
+        ]
+    }
+
+
+def time_per_call(fn, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for question in QUESTIONS:
+            fn(question)
+    return (time.perf_counter() - start) / (repeat * len(QUESTIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=800)
+    parser.add_argument("--columns", type=int, default=31)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    schema = build_wide_schema(args.tables, args.columns)
+    n_columns = sum(len(c) for c in schema["tables"].values())
+    print(f"synthetic schema: {len(schema['tables'])} tables, {n_columns} columns, "
+          f"{len(schema['foreign_keys'])} fks")
+
+    start = time.perf_counter()
+    index = SchemaIndex(schema)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # the index scores exactly the tables the scan matches
+    for question in QUESTIONS:
+        keywords = extract_keywords(question)
+        assert set(index.score_tables(keywords)) == match_tables_scan(schema["tables"], keywords)
+
+    scan = time_per_call(
+        lambda q: match_tables_scan(schema["tables"], extract_keywords(q)), args.repeat
+    )
+    indexed = time_per_call(
+        lambda q: index.score_tables(extract_keywords(q)), args.repeat
+    )
+    linear_trim = time_per_call(
+        lambda q: trim_schema_linear(schema, q), args.repeat
+    )
+    ranked = time_per_call(
+        lambda q: trim_schema_for_prompt(schema, q, index=index), args.repeat
+    )
+
+    print(f"index build (once per schema)  {build_ms:9.1f} ms")
+    print(f"keyword match, full scan       {scan * 1000:9.2f} ms/question")
+    print(f"keyword match+score, indexed   {indexed * 1000:9.2f} ms/question  x{scan / indexed:5.1f}")
+    print(f"full trim, linear scan (old)   {linear_trim * 1000:9.2f} ms/question")
+    print(f"full ranked trim, indexed      {ranked * 1000:9.2f} ms/question  x{linear_trim / ranked:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,16 @@
+import os
+import re
+
+from sqlalchemy import and_, or_
+
 from model import ChatMessage
 
+
+# default / largest page for the session list and chat history
+PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("CHAT_MAX_PAGE_SIZE", "200"))
+
+
 def save_assistant_message(db, session_id: int, content: str):
     msg = ChatMessage(
         session_id=session_id,
@@ -8,3 +19,33 @@ def save_assistant_message(db, session_id: int, content: str):
     )
     db.add(msg)
     db.commit()
+
+
+# the "### SQL Query" block format_static_response writes for answered questions
+SQL_BLOCK = re.compile(r"### SQL Query\n```sql\n(.*?)\n```", re.DOTALL)
+
+
+def message_sql(content: str | None) -> str | None:
+    """
+    The SQL an assistant message was answered with, or None (errors,
+    empty results and other messages without a result table).
+    """
+    match = SQL_BLOCK.search(content or "")
+    return match.group(1).strip() if match else None
+
+
+def keyset_page(query, model, before_id: int | None, limit: int, scope):
+    """
+    Newest-first page of `query` strictly older than the row `before_id`
+    ((created_at, id) order, served by the (<scope>, created_at) index).
+    An unknown before_id gives an empty page.
+    """
+    if before_id is not None:
+        cursor = query.session.query(model.created_at).filter(model.id == before_id, scope).first()
+        if cursor is None:
+            return []
+        query = query.filter(or_(
+            model.created_at < cursor.created_at,
+            and_(model.created_at == cursor.created_at, model.id < before_id)
+        ))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit).all()
@@ -1,7 +1,8 @@
+import os
 from sqlalchemy import create_engine, Column, Integer,String
 from sqlalchemy.orm import sessionmaker, declarative_base
 
-AUTH_DATABASE_URL="sqlite:///data/auth.db"
+AUTH_DATABASE_URL=os.getenv("AUTH_DATABASE_URL","sqlite:///data/auth.db")
 
 auth_engine=create_engine(AUTH_DATABASE_URL,connect_args={'check_same_thread':False})
 
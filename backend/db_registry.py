@@ -0,0 +1,150 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_ENGINE_IDLE_SECONDS = int(os.getenv("DB_ENGINE_IDLE_SECONDS", "900"))
+# how often the server sweeps idle engines (their pools hold open connections)
+DB_ENGINE_EVICT_INTERVAL_SECONDS = int(os.getenv("DB_ENGINE_EVICT_INTERVAL_SECONDS", "60"))
+DB_MAX_ENGINES = int(os.getenv("DB_MAX_ENGINES", "32"))
+
+
+def parse_db_overrides(raw: str) -> dict:
+    """
+    Per-database settings from env, e.g. "<connection_uri_hash>=300,<hash>=0".
+    Keys are returned as cache keys ("db:<hash>").
+    """
+    overrides = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        uri_hash, value = item.split("=", 1)
+        overrides[f"db:{uri_hash.strip()}"] = float(value)
+    return overrides
+
+
+def build_engine(connection_uri: str):
+    """
+    Creates a pooled engine for a target database.
+    SQLite gets SQLAlchemy's default pool (no overflow settings).
+    """
+    url = make_url(connection_uri)
+
+    if url.get_backend_name() == "sqlite":
+        return create_engine(
+            connection_uri,
+            connect_args={"check_same_thread": False},
+        )
+
+    return create_engine(
+        connection_uri,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+    )
+
+
+class EngineRegistry:
+    """
+    One pooled engine per target database, keyed by connection_uri_hash.
+
+    - engines idle longer than `idle_seconds` are disposed
+    - once more than `max_engines` are open, the least recently used is disposed
+    """
+
+    def __init__(
+        self,
+        max_engines: int = DB_MAX_ENGINES,
+        idle_seconds: int = DB_ENGINE_IDLE_SECONDS,
+    ):
+        self.max_engines = max_engines
+        self.idle_seconds = idle_seconds
+        self._engines = OrderedDict()   # uri_hash -> (engine, last_used)
+        self._lock = threading.Lock()
+
+    def get_engine(self, uri_hash: str, load_uri):
+        """
+        Returns the cached engine for `uri_hash`.
+        `load_uri` is only called on a miss, so decryption is paid once.
+        """
+        now = time.monotonic()
+        evicted = []
+
+        with self._lock:
+            entry = self._engines.get(uri_hash)
+            if entry is not None:
+                engine = entry[0]
+                self._engines[uri_hash] = (engine, now)
+                self._engines.move_to_end(uri_hash)
+            else:
+                engine = build_engine(load_uri())
+                self._engines[uri_hash] = (engine, now)
+
+            evicted.extend(self._pop_idle(now, keep=uri_hash))
+            while len(self._engines) > self.max_engines:
+                _, (old_engine, _) = self._engines.popitem(last=False)
+                evicted.append(old_engine)
+
+        # dispose outside the lock, closing connections can be slow
+        for old_engine in evicted:
+            old_engine.dispose()
+
+        return engine
+
+    def dispose(self, uri_hash: str) -> bool:
+        """
+        Drops and disposes the engine for `uri_hash` (e.g. after the
+        connection was updated). Returns True if one was open.
+        """
+        with self._lock:
+            entry = self._engines.pop(uri_hash, None)
+
+        if entry is None:
+            return False
+
+        entry[0].dispose()
+        return True
+
+    def evict_idle(self) -> int:
+        """
+        Disposes every engine idle longer than `idle_seconds`; returns how
+        many. Runs periodically, so an idle server closes its connections too.
+        """
+        with self._lock:
+            evicted = self._pop_idle(time.monotonic())
+
+        for engine in evicted:
+            engine.dispose()
+        return len(evicted)
+
+    def dispose_all(self):
+        with self._lock:
+            engines = [engine for engine, _ in self._engines.values()]
+            self._engines.clear()
+
+        for engine in engines:
+            engine.dispose()
+
+    def _pop_idle(self, now: float, keep: str | None = None):
+        if self.idle_seconds <= 0:
+            return []
+
+        idle = [
+            key for key, (_, last_used) in self._engines.items()
+            if key != keep and now - last_used > self.idle_seconds
+        ]
+        return [self._engines.pop(key)[0] for key in idle]
+
+    def __len__(self):
+        return len(self._engines)
+
+
+engine_registry = EngineRegistry()
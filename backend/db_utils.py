@@ -1,24 +1,30 @@
 from sqlalchemy import inspect
 
-def get_database_schema(engine)->str:
+from schema_serializer import serialize_schema
+
+def get_database_schema(engine, token_budget: int | None = None)->str:
+    """
+    Compact schema text with abbreviated column types, e.g.
+    orders(id int, customer_id int→customers.id, total dec)
+    """
     inspector=inspect(engine)
-    lines = []
+    schema = {"tables": {}, "foreign_keys": []}
+    column_types = {}
 
     for table in inspector.get_table_names():
-        lines.append(f"Table: {table}")
-        for col in inspector.get_columns(table):
-            lines.append(f" - {col['name']} ({col['type']})")
+        columns = inspector.get_columns(table)
+        schema["tables"][table] = [col["name"] for col in columns]
+        column_types[table] = {col["name"]: col["type"] for col in columns}
 
         # Foreign keys
-        fks = inspector.get_foreign_keys(table)
-        for fk in fks:
-            src_cols = ", ".join(fk["constrained_columns"])
-            tgt_table = fk["referred_table"]
-            tgt_cols = ", ".join(fk["referred_columns"])
-            lines.append(
-                f"   FK: {table}.{src_cols} → {tgt_table}.{tgt_cols}"
-            )
-
-        lines.append("")  # spacing
+        for fk in inspector.get_foreign_keys(table):
+            for src_col, tgt_col in zip(fk["constrained_columns"], fk["referred_columns"]):
+                schema["foreign_keys"].append({
+                    "source_table": table,
+                    "source_column": src_col,
+                    "target_table": fk["referred_table"],
+                    "target_column": tgt_col
+                })
 
-    return "\n".join(lines)
\ No newline at end of file
+    text, _ = serialize_schema(schema, token_budget=token_budget, column_types=column_types)
+    return text
@@ -1,8 +1,63 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from sqlalchemy import text
-from sqlalchemy.orm import Session
-from prompts import SQL_PROMPT,ANSWER_PROMPT,SQL_REPAIR_PROMPT
+from sql_rewriter import dry_run_sql
+from query_guard import QueryGuard
+from schema_serializer import serialize_schema
+from result_summary import result_digest
+from telemetry import logger,record_llm_usage,speculative_results,sql_candidate_results
+from sql_validator import validate_sql
+from prompts import (
+    SQL_PROMPT,SQL_REPAIR_PROMPT,
+    SCHEMA_PRUNE_PROMPT,ANSWER_STREAM_PROMPT,CHAT_TITLE_PROMPT,
+    SQL_CANDIDATE_HINTS
+)
 import re
 
+# Blocking work (sync DB drivers such as pyodbc) runs here so the event loop
+# never waits on it. The pool size bounds concurrent target-database work.
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+# Row budget for bounded execution: rows beyond this are never fetched.
+QUERY_MAX_FETCH_ROWS = int(os.getenv("QUERY_MAX_FETCH_ROWS", "1000"))
+# Run a COUNT(*) wrapper when the budget is exceeded, instead of "more than N"
+QUERY_COUNT_TOTAL = os.getenv("QUERY_COUNT_TOTAL", "0") == "1"
+# With LLM pruning, race generate_sql on the trimmed schema against prune -> generate
+SQL_SPECULATIVE = os.getenv("SQL_SPECULATIVE", "0") == "1"
+# >1 generates this many SQL candidates concurrently and keeps the first that dry-runs
+SQL_CANDIDATES = int(os.getenv("SQL_CANDIDATES", "1"))
+# statement timeout for a candidate's EXPLAIN / LIMIT 0 probe
+SQL_CANDIDATE_PROBE_SECONDS = float(os.getenv("SQL_CANDIDATE_PROBE_SECONDS", "5"))
+
+db_executor = ThreadPoolExecutor(
+    max_workers=DB_EXECUTOR_WORKERS,
+    thread_name_prefix="db-exec"
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+
+def _content(response) -> str:
+    if hasattr(response, "content"):
+        response = response.content
+    return response.strip()
+
+
+def schema_text(schema) -> str:
+    """
+    Prompt text for a schema: dicts go through the compact, token-budgeted
+    serializer, strings (already serialized / LLM-pruned) pass through.
+    """
+    if isinstance(schema, dict):
+        return serialize_schema(schema)[0]
+    return schema
+
+
 def clean_sql(sql: str) -> str:
     # remove markdown fences
     sql = re.sub(r"```sql", "", sql, flags=re.IGNORECASE)
@@ -17,113 +72,166 @@ def clean_sql(sql: str) -> str:
 
     raise ValueError("No valid SQL statement found")
 
-def generate_sql(llm,schema:str,question:str,dialect:str)->str:
-    raw = llm.invoke(
-        SQL_PROMPT.format(schema=schema, question=question,dialect=dialect)
-    )
-    if hasattr(raw,"content"):
-        raw=raw.content
-    raw=raw.strip()
-    sql=clean_sql(raw)
-    
-    return sql
-
-def execute_sql(engine,sql:str):
-    with engine.connect() as conn:
-        result = conn.execute(text(sql))
-        rows = result.fetchall()
-        columns = columns = [
-            col.split(".")[-1] if "." in col else col
-            for col in result.keys()
-        ]
-        return list(columns), rows
-
-def generate_answer(llm,question,columns,rows):
-    resp= llm.invoke(
-        ANSWER_PROMPT.format(
-            question=question,
-            columns=list(columns),
-            rows=rows
-        )
+async def agenerate_sql(llm,schema,question:str,dialect:str)->str:
+    raw = await llm.ainvoke(
+        SQL_PROMPT.format(schema=schema_text(schema), question=question,dialect=dialect)
     )
+    record_llm_usage("sql_generation", raw)
+    return clean_sql(_content(raw))
+
+async def _agenerate_sql_candidate(llm,schema,question:str,dialect:str,hint:str)->str:
+    prompt = SQL_PROMPT.format(schema=schema_text(schema), question=question,dialect=dialect)
+    if hint:
+        prompt += "\n" + hint + "\n"
+    raw = await llm.ainvoke(prompt)
+    record_llm_usage("sql_generation", raw)
+    return clean_sql(_content(raw))
+
+async def agenerate_sql_candidates(llm,schema,question:str,dialect:str,engine,k:int=SQL_CANDIDATES)->str:
+    """
+    Generates `k` SQL candidates concurrently (one prompt variant each, see
+    SQL_CANDIDATE_HINTS), checks each with validate_sql (sqlglot AST),
+    and dry-runs it (EXPLAIN or a zero-row limit) on the target database.
+    Returns the first candidate whose probe succeeds; the rest are cancelled.
+
+    If none succeeds, the first generated candidate is returned so the
+    normal execute / repair path reports the real error.
+    """
+    schema = schema_text(schema)
+    hints = [SQL_CANDIDATE_HINTS[i % len(SQL_CANDIDATE_HINTS)] for i in range(k)]
+    generated = {}
+
+    async def candidate(i):
+        sql = await _agenerate_sql_candidate(llm, schema, question, dialect, hints[i])
+        generated[i] = sql
+        try:
+            await run_blocking(validate_sql, sql, dialect)
+        except Exception:
+            sql_candidate_results.inc(outcome="invalid")
+            raise
+        try:
+            await run_blocking(probe_sql, engine, sql, dialect)
+        except Exception:
+            sql_candidate_results.inc(outcome="probe_failed")
+            raise
+        return sql
 
-    return resp.content.strip()
+    pending = {asyncio.create_task(candidate(i)) for i in range(k)}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    sql_candidate_results.inc(outcome="chosen")
+                    return task.result()
+                error = task.exception()
+                logger.debug("sql candidate rejected: %r", error)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if generated:
+        sql_candidate_results.inc(outcome="fallback")
+        return generated[min(generated)]
+    raise error
+
+async def agenerate_sql_speculative(llm,trimmed_schema:dict,question:str,dialect:str):
+    """
+    Starts generate_sql on the keyword-trimmed schema at the same time as
+    prune_schema -> generate_sql. The first branch to return SQL that passes
+    validate_sql wins and the other is cancelled.
 
-def repair_sql(llm,sql,error,schema,dialect,question):
+    Returns (sql, schema, branch): `schema` is what the SQL was generated
+    from (repair needs it), `branch` is "speculative" or "pruned".
+    """
+    async def speculative():
+        sql = await agenerate_sql(llm, trimmed_schema, question, dialect)
+        await run_blocking(validate_sql, sql, dialect)
+        return sql, trimmed_schema, "speculative"
+
+    async def pruned():
+        pruned_schema = await aprune_schema(llm, trimmed_schema, question)
+        sql = await agenerate_sql(llm, pruned_schema, question, dialect)
+        await run_blocking(validate_sql, sql, dialect)
+        return sql, pruned_schema, "pruned"
+
+    pending = {asyncio.create_task(speculative()), asyncio.create_task(pruned())}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    result = task.result()
+                    speculative_results.inc(winner=result[2])
+                    return result
+                error = task.exception()
+                logger.debug("speculative branch failed: %r", error)
+
+        speculative_results.inc(winner="none")
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+def probe_sql(engine,sql:str,dialect:str,timeout:float=SQL_CANDIDATE_PROBE_SECONDS):
+    """
+    Dry-runs `sql` (see sql_rewriter.dry_run_sql) under a short statement
+    timeout; raises whatever the database reports.
+    """
+    guard = QueryGuard(timeout)
+    with engine.connect() as conn:
+        try:
+            guard.attach(conn)
+            conn.execute(text(dry_run_sql(sql, dialect))).fetchall()
+        except Exception as e:
+            mapped = guard.classify(e)
+            if mapped is e:
+                raise
+            raise mapped from e
+        finally:
+            guard.detach()
+
+async def arepair_sql(llm,sql,error,schema,dialect,question):
     prompt=SQL_REPAIR_PROMPT.format(
         sql=sql,
         error=error,
-        schema=schema,
+        schema=schema_text(schema),
         dialect=dialect,
         question=question
     )
-    response=llm.invoke(prompt)
+    response=await llm.ainvoke(prompt)
+    record_llm_usage("repair", response)
     return response.content.strip()
 
-def prune_schema(llm, full_schema: str, question: str) -> str:
+async def aprune_schema(llm, full_schema, question: str) -> str:
     """
     Uses LLM to select only relevant tables & columns.
     Returns a SMALL schema string.
     """
+    prompt = SCHEMA_PRUNE_PROMPT.format(full_schema=schema_text(full_schema), question=question)
 
-    prompt = f"""
-    You are a database schema selection agent.
-
-Your task:
-- Select ONLY tables, columns, AND relationships needed to answer the question
-- Preserve foreign key relationships (FK)
-- Do NOT invent tables or columns
-- Do NOT generate SQL
-- Do NOT explain
-
-Output format (STRICT):
-example
-Table: table_name
-- column1
-- column2
-FK: table_name.column → table_name.column    
-
-Schema:
-{full_schema}
-
-Question:
-{question}
-"""
-
-    response = llm.invoke(prompt)
+    response = await llm.ainvoke(prompt)
+    record_llm_usage("prune", response)
 
     return response.content.strip()
 
-def generate_answer_stream(llm, question, columns, rows):
+async def agenerate_answer_stream(llm, question, columns, rows, total_rows=None):
+    """
+    Streams the insight. The prompt carries a local digest of `rows`
+    (column stats + a small sample, see result_summary), not the rows.
+    """
     if not rows:
         yield "No results were found."
         return
 
-    prompt = f"""
-You are a data analyst.
-
-Question:
-{question}
-
-Result Columns:
-{columns}
-
-Result Rows:
-{rows}
-
-OUTPUT RULES:
-- Respond ONLY with bullet points
-- Each bullet must fit in ONE line
-- Do NOT repeat table values verbatim
-- No SQL
-- No explanations of SQL
-- just Summarise the result briefly
-- If rows are empty, say exactly:
-  - No results were found.
-"""
+    # column stats over every fetched row: CPU work, kept off the event loop
+    summary = await run_blocking(result_digest, columns, rows, total_rows)
+    prompt = ANSWER_STREAM_PROMPT.format(question=question, summary=summary)
 
-
-    for chunk in llm.stream(prompt):
+    async for chunk in llm.astream(prompt):
+        record_llm_usage("answer_stream", chunk)
         yield chunk.content
 
 
@@ -141,20 +249,12 @@ def rows_to_markdown_table(columns, rows):
     return "\n".join([header, sep] + body)
 
 
-def generate_chat_title_llm(llm, question: str) -> str:
-    prompt = f"""
-    Generate a very short chat title (max 6 words).
-    No punctuation.
-    No quotes.
-    No markdown.
-
-    Question:
-    {question}
-    """
+async def agenerate_chat_title_llm(llm, question: str) -> str:
+    prompt = CHAT_TITLE_PROMPT.format(question=question)
     try:
-        title = llm.invoke(prompt).strip()
+        response = await llm.ainvoke(prompt)
+        record_llm_usage("title", response)
+        title = _content(response)
         return title[:60]
     except Exception:
         return ""
-
-
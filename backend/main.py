@@ -2,34 +2,53 @@ from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_ollama import ChatOllama
 
-from fastapi import FastAPI, HTTPException,Depends
+from fastapi import FastAPI, HTTPException,Depends,Request,Query
 from pydantic import BaseModel
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse,PlainTextResponse
 from response_formatter import format_static_response
-from chat_utils import save_assistant_message
-from sqlalchemy import inspect
-from typing import Generator
+from chat_utils import save_assistant_message,message_sql,keyset_page,PAGE_SIZE,MAX_PAGE_SIZE
 from sqlalchemy.orm import Session
 from sqlalchemy import create_engine
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import text
-import pyodbc
-import re
+import json
+import asyncio
+import secrets
+from starlette.background import BackgroundTask
 
 
 
 from database import Base,AuthSessionLocal,auth_engine
 from model import User,ChatMessage,ChatSession,DatabaseConnection
 from auth_utils import get_current_user,create_access_token,verify_password,hash_password,encrypt,decrypt,hash_uri
-from llm_utils import generate_answer,generate_sql,execute_sql,repair_sql,prune_schema,generate_answer_stream,generate_chat_title_llm
-from db_utils import get_database_schema
-from schema_cache import get_schema_for_db
+from llm_utils import (
+    agenerate_sql,arepair_sql,aprune_schema,
+    agenerate_answer_stream,agenerate_chat_title_llm,run_blocking,
+    agenerate_sql_speculative,agenerate_sql_candidates,
+    QUERY_MAX_FETCH_ROWS,SQL_SPECULATIVE,SQL_CANDIDATES
+)
+from schema_cache import get_schema_for_db,invalidate_schema
 from sql_validator import validate_sql
-from semantic_guard import sql_matches_question
-from schema_trimmer import trim_schema_for_prompt
+from schema_trimmer import trim_schema_for_prompt,get_schema_index
+from schema_retriever import get_schema_retriever,SCHEMA_PRUNE_MODE
+from schema_serializer import serialize_schema
 from sql_metadata import extract_sql_metadata
+from sql_rewriter import apply_row_limit,QUERY_AUTO_LIMIT
+from query_guard import QueryGuard,QueryTimeout,QueryCancelled,run_cancellable,timeout_for,query_stats
+from db_registry import engine_registry,DB_ENGINE_EVICT_INTERVAL_SECONDS
+from sql_cache import sql_cache,schema_content_key,SQL_CACHE_ENABLED
+from result_cache import result_cache,RESULT_CACHE_ENABLED
+from answer_templates import template_answer,TEMPLATE_ANSWERS_ENABLED
+from row_stream import RowStream,QUERY_STREAM_BATCH_ROWS
+from stream_frames import stream_format,media_type,encode_frame,rows_frame
+from result_export import start_export,export_chunks,check_format,ExportUnavailable,EXPORT_FORMATS,EXPORT_MAX_ROWS,EXPORT_MAX_BYTES
+from telemetry import logger,RequestTrace,render_metrics,cache_events,rows_fetched,METRICS_TOKEN
 
 Base.metadata.create_all(bind=auth_engine)
+# create_all skips indexes of tables that already exist
+for table in (ChatSession.__table__,ChatMessage.__table__):
+    for index in table.indexes:
+        index.create(bind=auth_engine,checkfirst=True)
 
 load_dotenv()
 app=FastAPI()
@@ -45,6 +64,33 @@ app.add_middleware(
 )
 
 
+async def evict_idle_engines():
+    while True:
+        await asyncio.sleep(DB_ENGINE_EVICT_INTERVAL_SECONDS)
+        try:
+            # disposing closes pooled connections, keep it off the event loop
+            evicted=await run_blocking(engine_registry.evict_idle)
+        except Exception as e:
+            logger.warning("idle engine eviction failed: %r", e)
+            continue
+        if evicted:
+            logger.info("disposed %d idle database engines", evicted)
+
+
+@app.on_event("startup")
+async def start_engine_eviction():
+    app.state.engine_eviction=asyncio.create_task(evict_idle_engines())
+
+
+@app.on_event("shutdown")
+def dispose_engines():
+    task=getattr(app.state,"engine_eviction",None)
+    if task is not None:
+        task.cancel()
+    engine_registry.dispose_all()
+    auth_engine.dispose()
+
+
 try:
     llm=ChatGoogleGenerativeAI(
         model="gemini-2.5-flash-lite",
@@ -198,6 +244,9 @@ def add_database(
         db.commit()
         db.refresh(existing)
 
+        # connection was replaced, drop the pooled engine so it is rebuilt
+        engine_registry.dispose(uri_hash)
+
         return{
             "id":existing.id,
             "name":existing.name,
@@ -229,6 +278,55 @@ def list_databases(db:Session=Depends(get_auth_db),user_id:int=Depends(get_curre
         }
         for d in dbs
     ]
+@app.post("/databases/{db_id}/schema/refresh")
+def refresh_database_schema(
+    db_id:int,
+    db:Session=Depends(get_auth_db),
+    user_id:int=Depends(get_current_user)
+):
+    db_conn=(
+        db.query(DatabaseConnection)
+        .filter(
+            DatabaseConnection.id==db_id,
+            DatabaseConnection.user_id==user_id
+        )
+        .first()
+    )
+    if not db_conn:
+        raise HTTPException(status_code=404,detail="Database not found")
+
+    engine=engine_registry.get_engine(
+        db_conn.connection_uri_hash,
+        lambda: decrypt(db_conn.connection_uri_enc)
+    )
+    cache_key=f"db:{db_conn.connection_uri_hash}"
+    invalidate_schema(cache_key)
+    schema=get_schema_for_db(cache_key=cache_key,engine=engine,force_refresh=True)
+
+    return {
+        "id":db_conn.id,
+        "tables":len(schema["tables"]),
+        "foreign_keys":len(schema["foreign_keys"])
+    }
+
+@app.get("/cache/stats")
+def cache_stats(user_id:int=Depends(get_current_user)):
+    return {
+        "sql_cache":sql_cache.stats(),
+        "result_cache":result_cache.stats(),
+        "queries":dict(query_stats)
+    }
+
+@app.get("/metrics")
+def metrics(request:Request):
+    # Prometheus text exposition format, for scrapers holding METRICS_TOKEN
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404,detail="Not Found")
+    supplied=request.headers.get("authorization","").encode()
+    if not secrets.compare_digest(supplied,f"Bearer {METRICS_TOKEN}".encode()):
+        raise HTTPException(status_code=401,detail="Invalid metrics token",headers={"WWW-Authenticate":"Bearer"})
+    return PlainTextResponse(render_metrics(),media_type="text/plain; version=0.0.4")
+
 class CreateSessionRequest(BaseModel):
     db_id:int
 
@@ -272,105 +370,313 @@ def build_chat_title(
     return f"[{dialect.upper()}] {db_name} — {base}"
 
 
+def auto_title(text:str,max_words:int=6)->str:
+    words=text.strip().split()
+    title=" ".join(words[:max_words])
+    return title[:60]
+
+
+def meta_frame(payload:dict)->str:
+    return "__META__" + json.dumps(payload) + "__END_META__"
+
+
 @app.get('/chat/sessions')
-def list_sessions(db:Session=Depends(get_auth_db),user_id:int=Depends(get_current_user)):
-    sessions=db.query(ChatSession).filter(ChatSession.user_id==user_id).order_by(ChatSession.created_at.desc()).all()
-    return sessions
+def list_sessions(
+    before_id:int|None=None,
+    limit:int=Query(PAGE_SIZE,ge=1,le=MAX_PAGE_SIZE),
+    db:Session=Depends(get_auth_db),
+    user_id:int=Depends(get_current_user)
+):
+    """
+    Newest sessions first; pass the last id of a page as before_id for the
+    next one. Only the sidebar fields are loaded.
+    """
+    scope=ChatSession.user_id==user_id
+    query=db.query(
+        ChatSession.id,ChatSession.title,ChatSession.db_id,ChatSession.created_at
+    ).filter(scope)
+    return [row._asdict() for row in keyset_page(query,ChatSession,before_id,limit,scope)]
 
 class ChatMessageRequest(BaseModel):
     message:str
 
 @app.post('/chat/{session_id}/messages')
-def chat_message(session_id:int,request:ChatMessageRequest,auth_db:Session=Depends(get_auth_db),user_id:int=Depends(get_current_user)):
-    chat_session=auth_db.query(ChatSession).filter(ChatSession.id==session_id,ChatSession.user_id==user_id).first()
+async def chat_message(session_id:int,request:ChatMessageRequest,http_request:Request,auth_db:Session=Depends(get_auth_db),user_id:int=Depends(get_current_user)):
+    # auth DB (sync ORM) work runs on the executor like target-DB work; ORM
+    # objects expire on commit, so the fields used later are copied out here
+    def load_request():
+        chat_session=auth_db.query(ChatSession).filter(ChatSession.id==session_id,ChatSession.user_id==user_id).first()
 
-    print("STEP 1: entered endpoint")
-    if not chat_session:
-        raise HTTPException(status_code=404,detail="Chat session not found")
+        if not chat_session:
+            raise HTTPException(status_code=404,detail="Chat session not found")
 
 
-    user_msg=ChatMessage(session_id=session_id,role="user",content=request.message)
-    print("STEP 2: session OK")
-    auth_db.add(user_msg)
-    auth_db.commit()
+        user_msg=ChatMessage(session_id=session_id,role="user",content=request.message)
+        auth_db.add(user_msg)
+        auth_db.commit()
 
-    print("STEP 3: user message saved")
+        logger.debug("chat session=%s user message saved", session_id)
 
-    #Get db schema dynamically
-    db_conn = (
-        auth_db.query(DatabaseConnection)
-        .filter(
-            DatabaseConnection.id == chat_session.db_id,
-            DatabaseConnection.user_id == user_id
+        #Get db schema dynamically
+        db_conn = (
+            auth_db.query(DatabaseConnection)
+            .filter(
+                DatabaseConnection.id == chat_session.db_id,
+                DatabaseConnection.user_id == user_id
+            )
+            .first()
         )
-        .first()
-    )
 
-    # after saving user message
-    if chat_session.title is None:
-        llm_title = generate_chat_title_llm(llm, request.message)
+        if not db_conn:
+            raise HTTPException(status_code=404, detail="Database not found")
+
+        # after saving user message:
+        # heuristic title now, LLM title generated concurrently and sent later
+        new_session = chat_session.title is None
+        if new_session:
+            chat_session.title = build_chat_title(
+                dialect=db_conn.dialect,
+                db_name=db_conn.name,
+                first_question=request.message,
+                llm_title=auto_title(request.message),
+            )
+            auth_db.commit()
+
+        engine=engine_registry.get_engine(
+            db_conn.connection_uri_hash,
+            lambda: decrypt(db_conn.connection_uri_enc)
+        )
+        return (
+            chat_session, chat_session.title, new_session, chat_session.db_id,
+            db_conn.name, db_conn.dialect, db_conn.connection_uri_hash, engine
+        )
+
+    (chat_session, session_title, new_session, db_id,
+     db_name, db_dialect, uri_hash, engine) = await run_blocking(load_request)
+
+    trace = RequestTrace(db=uri_hash[:12])
+    # "ndjson" / "sse": typed frames with rows sent as they are fetched; None: Markdown text
+    fmt = stream_format(http_request.headers.get("accept"))
+
+    async def save_answer(content: str):
+        await run_blocking(save_assistant_message, auth_db, session_id, content)
+
+    title_task = None
+    if new_session:
+        async def timed_title():
+            with trace.span("title"):
+                return await agenerate_chat_title_llm(llm, request.message)
+
+        title_task = asyncio.create_task(timed_title())
+
+    async def apply_llm_title():
+        """
+        Waits for the background title and stores it.
+        Returns the new title, or None if there is nothing to update.
+        """
+        if title_task is None:
+            return None
+
+        llm_title = await title_task
+        if not llm_title:
+            return None
 
-        chat_session.title = build_chat_title(
-            dialect=db_conn.dialect,
-            db_name=db_conn.name,
+        title = build_chat_title(
+            dialect=db_dialect,
+            db_name=db_name,
             first_question=request.message,
             llm_title=llm_title,
         )
 
-        auth_db.commit()
+        def store_title():
+            chat_session.title = title
+            auth_db.commit()
+
+        await run_blocking(store_title)
+        return title
 
-    if not db_conn:
-        raise HTTPException(status_code=404, detail="Database not found")
-    
-    connection_uri=decrypt(db_conn.connection_uri_enc)
-    engine=create_engine(connection_uri)
     dialect=engine.dialect.name
 
-    print("STEP 4: engine OK", engine,dialect)
-    cache_key = f"db:{db_conn.connection_uri_hash}"
-    full_schema = get_schema_for_db(cache_key=cache_key, engine=engine)
+    cache_key = f"db:{uri_hash}"
+    def load_schema():
+        # the keyword index build (hundreds of ms for large schemas) stays off the event loop too
+        schema = get_schema_for_db(cache_key=cache_key, engine=engine)
+        return schema, get_schema_index(cache_key, schema)
+
+    with trace.span("schema_load"):
+        full_schema, schema_index = await run_blocking(load_schema)
     # schema=get_schema_for_db(db_id=chat_session.db_id,engine=engine)
-    print("STEP 5: schema extracted",full_schema)
+    logger.debug("schema loaded: %d tables (%s)", len(full_schema["tables"]), dialect)
+
+    with trace.span("trim"):
+        trimmed_schema = await run_blocking(
+            trim_schema_for_prompt,
+            full_schema=full_schema,
+            user_question=request.message,
+            max_tables=15,
+            index=schema_index
+        )
 
-    trimmed_schema = trim_schema_for_prompt(
-        full_schema=full_schema,
-        user_question=request.message,
-        max_tables=15
-    )
+    logger.debug("trimmed schema: %s", list(trimmed_schema["tables"]))
+
+    # NL -> SQL cache: a hit skips both prune_schema and generate_sql
+    schema_fp = schema_content_key(trimmed_schema)
+    cached_sql = None
+    if SQL_CACHE_ENABLED:
+        cached_sql = sql_cache.get(cache_key, dialect, schema_fp, request.message)
+        cache_events.inc(cache="sql", result="miss" if cached_sql is None else "hit")
+
+    result_cache_status = "off"
+
+    async def run_query(query: str, parsed):
+        """
+        Executes through the opt-in result cache and returns a RowStream
+        holding at least the first batch. Structured streams fetch the rest
+        while the response is sent; otherwise the first batch is the whole
+        (bounded) result.
+        `parsed` is the ParsedSQL from validate_sql, reused for keys and rewrites.
+        """
+        nonlocal result_cache_status
+        if RESULT_CACHE_ENABLED:
+            cached = result_cache.get(cache_key, query, dialect, parsed)
+            result_cache_status = "miss" if cached is None else "hit"
+            cache_events.inc(cache="result", result=result_cache_status)
+            if cached is not None:
+                return RowStream.from_result(*cached)
+
+        # let the database stop after the fetch budget (+1 to detect "more")
+        exec_sql = query
+        if QUERY_AUTO_LIMIT:
+            exec_sql = apply_row_limit(query, dialect, QUERY_MAX_FETCH_ROWS + 1, parsed)
+
+        # statement timeout + server-side cancel if the client disconnects
+        guard = QueryGuard(timeout_for(cache_key))
+        stream = RowStream(
+            engine, exec_sql, dialect=dialect, count_from=query, guard=guard,
+            batch_rows=QUERY_STREAM_BATCH_ROWS if fmt else None
+        )
+        with trace.span("execution"):
+            await run_cancellable(stream.start(), guard, http_request.is_disconnected)
+        return stream
+
+    def record_result(query: str, stream: RowStream):
+        """
+        Counts a completely fetched result and stores it in the result cache
+        (cache hits are neither counted nor stored again).
+        """
+        if result_cache_status == "hit":
+            return
+        rows_fetched.inc(len(stream.rows), db=trace.db)
+        if RESULT_CACHE_ENABLED:
+            result_cache.put(
+                cache_key, query, dialect,
+                (stream.columns, stream.rows, stream.total_rows)
+            )
 
-    print("STEP 5A: trimmed schema", trimmed_schema)
+    def cache_sql(query: str, stream: RowStream):
+        """
+        Remembers SQL for the question once it has run to the end without
+        error (NOT_ANSWERABLE answers are not worth caching).
+        """
+        if SQL_CACHE_ENABLED and stream.rows != [("NOT_ANSWERABLE",)]:
+            sql_cache.put(cache_key, dialect, schema_fp, request.message, query)
 
-    pruned_schema=prune_schema(
-        llm=llm,
-        full_schema=trimmed_schema,
-        question=request.message
-    )
+    def single_message_stream(message: str, outcome: str, frame: str = "error"):
+        trace.log_summary(outcome)
 
-    def single_message_stream(message: str):
         def gen():
-            yield message
-        return StreamingResponse(gen(), media_type="text/plain")
+            if fmt is None:
+                yield message
+                return
+            if frame == "error":
+                yield encode_frame(fmt, "error", message=message)
+            else:
+                yield encode_frame(fmt, "insight", text=message)
+            yield encode_frame(fmt, "done", outcome=outcome)
+        return StreamingResponse(
+            gen(),
+            media_type=media_type(fmt),
+            background=BackgroundTask(apply_llm_title)
+        )
+
+    if cached_sql is not None:
+        # repair (if ever needed) works from the keyword-trimmed schema
+        pruned_schema = trimmed_schema
+        sql = cached_sql
+        logger.debug("sql cache hit: %s", sql)
+    else:
+        try:
+            if SQL_SPECULATIVE and SCHEMA_PRUNE_MODE == "llm":
+                # trimmed-schema SQL races the prune -> generate chain
+                with trace.span("sql_generation"):
+                    sql, pruned_schema, branch = await agenerate_sql_speculative(
+                        llm=llm,
+                        trimmed_schema=trimmed_schema,
+                        question=request.message,
+                        dialect=dialect
+                    )
+                logger.debug("sql generated (%s branch): %s", branch, sql)
+            else:
+                with trace.span("prune"):
+                    if SCHEMA_PRUNE_MODE == "local":
+                        # offline vector retrieval instead of an LLM round trip
+                        def retrieve():
+                            retriever = get_schema_retriever(cache_key, full_schema)
+                            return serialize_schema(retriever.retrieve(trimmed_schema, request.message))
+
+                        pruned_schema, schema_tokens = await run_blocking(retrieve)
+                        logger.debug("pruned schema: ~%d tokens", schema_tokens)
+                    else:
+                        pruned_schema=await aprune_schema(
+                            llm=llm,
+                            full_schema=trimmed_schema,
+                            question=request.message
+                        )
+
+                #generate sql
+                with trace.span("sql_generation"):
+                    if SQL_CANDIDATES > 1:
+                        sql=await agenerate_sql_candidates(
+                            llm=llm,
+                            schema=pruned_schema,
+                            question=request.message,
+                            dialect=dialect,
+                            engine=engine
+                        )
+                    else:
+                        sql=await agenerate_sql(llm=llm,schema=pruned_schema,question=request.message,dialect=dialect)
+                logger.debug("sql generated: %s", sql)
+        except Exception as e:
+            logger.warning("sql generation failed: %r", e)
+            answer=("I couldn't understand your question well enough to "
+                    "generate a database query. Please rephrase it.")
+            await save_answer(answer)
+
+            return single_message_stream(answer, "generation_failed")
+   
+    # after SQL generation
+    def validate():
+        # one (cached) parse, reused by metadata, limit injection and cache keys
+        parsed=validate_sql(sql,dialect)
+        return parsed,extract_sql_metadata(sql=sql,dialect=dialect,parsed=parsed)
 
-    print("its working",pruned_schema)
-    #generate sql
     try:
-        sql=generate_sql(llm=llm,schema=pruned_schema,question=request.message,dialect=dialect)
-        print("STEP 6: sql generated", sql)
-    except Exception as e:
-        print("sql generation failed:",sql,repr(e))
-        answer=("I couldn't understand your question well enough to "
-                "generate a database query. Please rephrase it.")
-        save_assistant_message(auth_db, session_id, answer)
+        with trace.span("validation"):
+            parsed_sql,metadata=await run_blocking(validate)
+    except ValueError as e:
+        answer = (
+            "I generated a query that does not match the database schema. "
+            "Please try rephrasing your question."
+        )
 
-        return single_message_stream(answer)
-   
-    metadata=extract_sql_metadata(sql=sql,dialect=db_conn.dialect)
+        await save_answer(answer)
+
+        return single_message_stream(answer, "invalid_sql")
 
     response_meta = {
-        "type": "meta",
-        "session_title": chat_session.title,
+        "session_title": session_title,
         "database": {
-            "name": db_conn.name,
+            "name": db_name,
             "dialect": dialect,
         },
         "tables": metadata["tables"],
@@ -378,40 +684,44 @@ def chat_message(session_id:int,request:ChatMessageRequest,auth_db:Session=Depen
         "sql": sql,
     }
 
-    # after SQL generation
+    #execute sql
     try:
-        validate_sql(sql)
-    except ValueError as e:
+        stream=await run_query(sql,parsed_sql)
+    except QueryCancelled:
+        answer = "The query was cancelled."
+        await save_answer(answer)
+        return single_message_stream(answer, "cancelled")
+    except QueryTimeout as e:
+        # a timeout is a cost problem, repairing the SQL won't help
         answer = (
-            "I generated a query that does not match the database schema. "
-            "Please try rephrasing your question."
+            f"The query took too long and was stopped ({e}). "
+            "Try narrowing your question, e.g. with a date range or filter.\n\n"
+            f"SQL used:\n```sql\n{sql}"
         )
-
-        save_assistant_message(auth_db, session_id, answer)
-
-        return single_message_stream(answer)
-    #execute sql
-    try:
-        columns,rows=execute_sql(engine,sql)
-        print("step 7: columns and rows :",columns,rows,sql)
+        await save_answer(answer)
+        return single_message_stream(answer, "timeout")
     except Exception as e:
+        if cached_sql is not None:
+            sql_cache.discard(cache_key, dialect, schema_fp, request.message)
         try:
-            repaired_sql=repair_sql(
-                llm=llm,
-                schema=pruned_schema,
-                dialect=dialect,
-                sql=sql,
-                error=str(e),
-                question=request.message
-            )
+            with trace.span("repair"):
+                repaired_sql=await arepair_sql(
+                    llm=llm,
+                    schema=pruned_schema,
+                    dialect=dialect,
+                    sql=sql,
+                    error=str(e),
+                    question=request.message
+                )
             if repaired_sql.strip()=="SELECT 'NOT_ANSSWERABLE';":
                 raise ValueError("Not asnwerable")
             
-            validate_sql(repaired_sql)
-            columns,rows=execute_sql(engine,repaired_sql)
+            with trace.span("validation"):
+                parsed_repair=await run_blocking(validate_sql,repaired_sql,dialect)
+            stream=await run_query(repaired_sql,parsed_repair)
             sql=repaired_sql
         except Exception:
-            print("SQL EXECUTION ERROR:", e)
+            logger.warning("sql execution failed: %r", e)
             answer = (
                 "I couldn't run this query on the database. "
                 "This usually happens when the question requires "
@@ -419,24 +729,34 @@ def chat_message(session_id:int,request:ChatMessageRequest,auth_db:Session=Depen
                 f"SQL used:\n```sql\n{sql}"
             )
 
-        save_assistant_message(auth_db, session_id, answer)
+            await save_answer(answer)
 
-        return single_message_stream(answer)
+            return single_message_stream(answer, "execution_failed")
+
+    # structured streams: the first batch so far, the rest follows in the response
+    columns,rows=stream.columns,stream.rows
+    # recorded (and the SQL cached) exactly once, when the stream has finished
+    # without error: here if the first batch was the whole result, otherwise
+    # at the end of frame_generator
+    finished_early=stream.done
+    if finished_early:
+        record_result(sql, stream)
+        cache_sql(sql, stream)
+    logger.debug("query returned %d rows, %d columns", len(rows), len(columns))
 
-    
     if not rows or rows == [(None,)]:
         answer= ("There is no data available in the database.\n\n"
                 f"SQL Query:\n```sql\n{sql}"
         )
-        save_assistant_message(auth_db, session_id, answer)
-        return single_message_stream(answer)
+        await save_answer(answer)
+        return single_message_stream(answer, "empty", frame="insight")
         
     if rows == [("NOT_ANSWERABLE",)]:
         answer=( "I can't answer that question using the available database."
                 f"SQL Query:\n```sql\n{sql}"
         )
-        save_assistant_message(auth_db, session_id, answer)
-        return single_message_stream(answer)
+        await save_answer(answer)
+        return single_message_stream(answer, "not_answerable", frame="insight")
 
     # def qualify_columns(columns, tables):
     #     if len(tables) == 1:
@@ -452,29 +772,50 @@ def chat_message(session_id:int,request:ChatMessageRequest,auth_db:Session=Depen
     # qualified_columns=qualify_columns(columns,tables)
     
     MAX_ROWS = 10
-    total_rows = len(rows)
-
-    display_rows = rows[:MAX_ROWS]
-
-    static_part = format_static_response(
-        db_name=db_conn.name,
-        dialect=dialect,
-        sql=sql,
-        tables=metadata["tables"],
-        columns=columns,
-        rows=display_rows,
-        total_rows=total_rows
-    )
 
+    def static_response() -> str:
+        # persisted Markdown: header and the first MAX_ROWS rows only
+        return format_static_response(
+            db_name=db_name,
+            dialect=dialect,
+            sql=sql,
+            tables=metadata["tables"],
+            columns=columns,
+            rows=stream.rows[:MAX_ROWS],
+            total_rows=stream.total_rows,
+            fetched_rows=len(stream.rows)
+        )
+
+    async def insight_tokens():
+        # simple result shapes (scalar, one row, small label/value set) need no LLM
+        templated = template_answer(columns, stream.rows, stream.total_rows) if TEMPLATE_ANSWERS_ENABLED else None
+        if templated is not None:
+            yield templated
+            return
+
+        # stream explanation
+        with trace.span("answer_stream"):
+            # insight covers every fetched row (as a local digest), not only the displayed ones
+            async for token in agenerate_answer_stream(
+                llm=llm,
+                question=request.message,
+                columns=columns,
+                rows=stream.rows,
+                total_rows=stream.total_rows
+            ):
+                yield token
+
+    static_part = static_response() if fmt is None else None
 
-    has_rows = bool(rows) and display_rows != [(None,)]
-    import json
-    def event_generator():
+    has_rows = bool(rows) and rows[:MAX_ROWS] != [(None,)]
+    async def event_generator():
         explanation_chunks = []
 
-        yield "__META__" + json.dumps({
-            "session_title": chat_session.title
-        }) + "__END_META__"
+        yield meta_frame({
+            "session_title": session_title,
+            "sql_cache": "hit" if cached_sql is not None else "miss",
+            "result_cache": result_cache_status
+        })
 
         # send static part immediately
         yield static_part.rstrip() + "\n\n"
@@ -482,40 +823,192 @@ def chat_message(session_id:int,request:ChatMessageRequest,auth_db:Session=Depen
         # 🚨 HARD GUARD
         if not has_rows:
             final_answer = static_part
-            save_assistant_message(auth_db, session_id, final_answer)
-            return
-        # stream explanation
-        for token in generate_answer_stream(
-            llm=llm,
-            question=request.message,
-            columns=columns,
-            rows=display_rows
-        ):
-            explanation_chunks.append(token)
-            yield token
-
-        # save full answer after streaming completes
-        final_answer = static_part.rstrip() + "\n\n" + "".join(explanation_chunks).lstrip()
-        save_assistant_message(auth_db, session_id, final_answer)
-    
-    print(
-        "DEBUG:",
-        "db_id =", chat_session.db_id,
-        "uri =", connection_uri
-    )
-    print("Generated SQL:\n", sql)
+            await save_answer(final_answer)
+        else:
+            async for token in insight_tokens():
+                explanation_chunks.append(token)
+                yield token
+
+            # save full answer after streaming completes
+            final_answer = static_part.rstrip() + "\n\n" + "".join(explanation_chunks).lstrip()
+            await save_answer(final_answer)
+
+        # follow-up meta frame once the LLM title is ready
+        llm_title = await apply_llm_title()
+        if llm_title:
+            yield meta_frame({"session_title": llm_title})
+
+        trace.log_summary("answered")
+
+    async def frame_generator():
+        """
+        Structured stream: meta, columns, row batches as the cursor is read,
+        insight tokens, done. The client renders the table from the rows;
+        no Markdown table is built for it.
+        """
+        explanation_chunks = []
+        outcome = "answered"
+
+        try:
+            yield encode_frame(fmt, "meta", **{
+                **response_meta,
+                "sql": sql,   # the repaired SQL, if repair ran
+                "sql_cache": "hit" if cached_sql is not None else "miss",
+                "result_cache": result_cache_status
+            })
+            yield encode_frame(fmt, "columns", columns=columns)
+            if rows:
+                yield rows_frame(fmt, rows)
+
+            with trace.span("row_stream"):
+                while not stream.done:
+                    batch = await run_cancellable(
+                        stream.next_batch(), stream.guard, http_request.is_disconnected
+                    )
+                    if batch:
+                        yield rows_frame(fmt, batch)
+            if not finished_early:
+                record_result(sql, stream)
+                cache_sql(sql, stream)
+
+            async for token in insight_tokens():
+                explanation_chunks.append(token)
+                yield encode_frame(fmt, "insight", text=token)
+
+            final_answer = static_response().rstrip() + "\n\n" + "".join(explanation_chunks).lstrip()
+            await save_answer(final_answer)
+        except QueryCancelled:
+            outcome = "cancelled"
+            answer = "The query was cancelled."
+            await save_answer(answer)
+            yield encode_frame(fmt, "error", message=answer)
+        except Exception as e:
+            logger.warning("result streaming failed: %r", e)
+            outcome = "timeout" if isinstance(e, QueryTimeout) else "execution_failed"
+            answer = (
+                f"Reading the query results failed ({e}).\n\n"
+                f"SQL used:\n```sql\n{sql}"
+            )
+            await save_answer(answer)
+            yield encode_frame(fmt, "error", message=answer)
+        finally:
+            # client gone or fetch failed: stop the statement, free the connection
+            stream.close()
+
+        llm_title = await apply_llm_title()
+        if llm_title:
+            yield encode_frame(fmt, "meta", session_title=llm_title)
+
+        yield encode_frame(
+            fmt, "done",
+            outcome=outcome,
+            row_count=len(stream.rows),
+            total_rows=stream.total_rows
+        )
+        trace.log_summary(outcome)
+
+    logger.debug("db_id=%s sql=%s", db_id, sql)
     return StreamingResponse(
-        event_generator(),
-        media_type="text/plain"
+        event_generator() if fmt is None else frame_generator(),
+        media_type=media_type(fmt)
     )
 
 @app.get('/chat/{session_id}/messages')
-def get_messages(session_id:int,db: Session = Depends(get_auth_db),user_id:int=Depends(get_current_user)):
+def get_messages(
+    session_id:int,
+    before_id:int|None=None,
+    limit:int=Query(PAGE_SIZE,ge=1,le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_auth_db),
+    user_id:int=Depends(get_current_user)
+):
+    """
+    The latest `limit` messages in chronological order; pass the first id
+    of a page as before_id to load the messages before it.
+    """
     session=db.query(ChatSession).filter(ChatSession.id==session_id,ChatSession.user_id==user_id).first()
     if not session:
         raise HTTPException(status_code=404,detail='Not found')
-    messages=db.query(ChatMessage).filter(ChatMessage.session_id==session_id).order_by(ChatMessage.created_at).all()
-    return messages
+    scope=ChatMessage.session_id==session_id
+    messages=keyset_page(db.query(ChatMessage).filter(scope),ChatMessage,before_id,limit,scope)
+    return messages[::-1]
+
+@app.get('/chat/{session_id}/messages/{message_id}/export')
+async def export_message(
+    session_id:int,
+    message_id:int,
+    format:str="csv",
+    db:Session=Depends(get_auth_db),
+    user_id:int=Depends(get_current_user)
+):
+    """
+    Streams the full result of an answered message's SQL as CSV, Arrow IPC
+    or Parquet (see result_export for the caps).
+    """
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise HTTPException(status_code=400,detail=str(e))
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501,detail=str(e))
+
+    # ORM lookups and SQL parsing run on the executor, off the event loop
+    def load_export():
+        session=db.query(ChatSession).filter(ChatSession.id==session_id,ChatSession.user_id==user_id).first()
+        if not session:
+            raise HTTPException(status_code=404,detail='Not found')
+
+        message=db.query(ChatMessage).filter(
+            ChatMessage.id==message_id,
+            ChatMessage.session_id==session_id,
+            ChatMessage.role=="assistant"
+        ).first()
+        sql=message_sql(message.content) if message else None
+        if not sql:
+            raise HTTPException(status_code=404,detail="No query result to export")
+
+        db_conn=db.query(DatabaseConnection).filter(
+            DatabaseConnection.id==session.db_id,
+            DatabaseConnection.user_id==user_id
+        ).first()
+        if not db_conn:
+            raise HTTPException(status_code=404,detail="Database not found")
+
+        engine=engine_registry.get_engine(
+            db_conn.connection_uri_hash,
+            lambda: decrypt(db_conn.connection_uri_enc)
+        )
+        dialect=engine.dialect.name
+
+        # stored messages are re-validated before anything runs again
+        try:
+            parsed=validate_sql(sql,dialect)
+        except ValueError as e:
+            raise HTTPException(status_code=400,detail=str(e))
+        return sql,engine,dialect,parsed
+
+    sql,engine,dialect,parsed=await run_blocking(load_export)
+
+    try:
+        stream,first_batch=await start_export(engine,sql,dialect,parsed)
+    except QueryTimeout as e:
+        raise HTTPException(status_code=504,detail=str(e))
+    except Exception as e:
+        logger.warning("export failed: %r", e)
+        raise HTTPException(status_code=400,detail="The query could not be run on the database")
+
+    media,extension=EXPORT_FORMATS[format]
+    return StreamingResponse(
+        export_chunks(stream,first_batch,format),
+        media_type=media,
+        headers={
+            "Content-Disposition":f'attachment; filename="message-{message_id}.{extension}"',
+            "X-Export-Row-Limit":str(EXPORT_MAX_ROWS),
+            # a result over either cap is cut off mid-transfer, never sent as a short file
+            "X-Export-Byte-Limit":str(EXPORT_MAX_BYTES)
+        },
+        # returns the connection even if the body was never read
+        background=BackgroundTask(stream.close)
+    )
 
 @app.delete("/chat/sessions/{session_id}")
 def delete_session(
@@ -536,17 +1029,12 @@ def delete_session(
 
     return {"success":True}
 
-
-def auto_title(text:str,max_words:int=6)->str:
-    words=text.strip().split()
-    title=" ".join(words[:max_words])
-    return title[:60]
-
 @app.post("/databases/test")
 def test_database(
     body:DatabaseCreate,
     user_id:int=Depends(get_current_user)
 ):
+    engine=None
     try:
         engine=create_engine(body.connection_uri)
         with engine.connect() as conn:
@@ -557,3 +1045,6 @@ def test_database(
             "ok":False,
             "error":f"{type(e).__name__}: {str(e)}"
         }
+    finally:
+        if engine is not None:
+            engine.dispose()
@@ -1,5 +1,5 @@
 from sqlalchemy import Column,ForeignKey,DateTime,Text,String,Integer
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint,Index
 from database import Base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -23,6 +23,11 @@ class ChatSession(Base):
 
     messages=relationship("ChatMessage",back_populates='session',cascade="all, delete")
 
+    # sidebar listing: newest sessions of a user, keyset-paginated
+    __table_args__ = (
+        Index("ix_chat_sessions_user_created", "user_id", "created_at"),
+    )
+
 class ChatMessage(Base):
     __tablename__="chat_messages"
 
@@ -33,6 +38,11 @@ class ChatMessage(Base):
     created_at=Column(DateTime,default=datetime.utcnow)
     session=relationship("ChatSession",back_populates='messages')
 
+    # chat history: a session's messages by time, keyset-paginated
+    __table_args__ = (
+        Index("ix_chat_messages_session_created", "session_id", "created_at"),
+    )
+
 class DatabaseConnection(Base):
     __tablename__="database_connections"
 
@@ -37,33 +37,6 @@ USER QUESTION
 {question}
 """
 
-ANSWER_PROMPT = """
-You are a data analyst answering a question using SQL results.
-
-INPUT
-User question:
-{question}
-
-SQL query result:
-Columns: {columns}
-Rows: {rows}
-
-RULES
-- Do NOT explain SQL
-- Do NOT describe steps
-- Do NOT repeat table values
-- Do Not Just repeat rows and values got from SQL query results
-- Use ONLY the given data
-- If rows are empty, output EXACTLY:
-  No results were found.
-
-OUTPUT FORMAT (MANDATORY):
-- Bullet points ONLY
-- A short natural-language summary of SQL results
-- Summarize the results briefly in 2-3 sentence
-
-"""
-
 SQL_REPAIR_PROMPT = """
 You are an expert SQL developer fixing a query.
 
@@ -93,3 +66,64 @@ Rules:
 SELECT 'NOT_ANSWERABLE';
 
 """
+
+
+SCHEMA_PRUNE_PROMPT = """
+    You are a database schema selection agent.
+
+Your task:
+- Select ONLY tables, columns, AND relationships needed to answer the question
+- Preserve foreign key relationships (FK)
+- Do NOT invent tables or columns
+- Do NOT generate SQL
+- Do NOT explain
+
+Output format (STRICT), same as the schema below, one table per line:
+example
+table_name(column1, column2, fk_column→other_table.column)
+
+Schema:
+{full_schema}
+
+Question:
+{question}
+"""
+
+ANSWER_STREAM_PROMPT = """
+You are a data analyst.
+
+Question:
+{question}
+
+Result summary (stats over all fetched rows, with a sample):
+{summary}
+
+OUTPUT RULES:
+- Respond ONLY with bullet points
+- Each bullet must fit in ONE line
+- Do NOT repeat table values verbatim
+- No SQL
+- No explanations of SQL
+- just Summarise the result briefly
+- If rows are empty, say exactly:
+  - No results were found.
+"""
+
+CHAT_TITLE_PROMPT = """
+    Generate a very short chat title (max 6 words).
+    No punctuation.
+    No quotes.
+    No markdown.
+
+    Question:
+    {question}
+    """
+
+# Extra instruction per SQL candidate when several are generated at once;
+# the first candidate uses the plain SQL_PROMPT.
+SQL_CANDIDATE_HINTS = [
+    "",
+    "HINT: Prefer explicit JOINs on the foreign keys over subqueries.",
+    "HINT: Write the simplest query that answers the question; avoid unnecessary joins.",
+    "HINT: Before answering, re-check that every column belongs to the table it is qualified with.",
+]
@@ -0,0 +1,223 @@
+import asyncio
+import math
+import os
+import threading
+import time
+
+from sqlalchemy import event
+
+from db_registry import parse_db_overrides
+from telemetry import logger, queries_total
+
+
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "30"))
+# QUERY_TIMEOUTS="<connection_uri_hash>=120,..."; 0 disables the timeout
+QUERY_TIMEOUTS = parse_db_overrides(os.getenv("QUERY_TIMEOUTS", ""))
+# how often a running query checks whether the HTTP client went away
+QUERY_DISCONNECT_POLL_SECONDS = float(os.getenv("QUERY_DISCONNECT_POLL_SECONDS", "0.5"))
+
+# SQLite progress handler granularity (VM instructions between checks)
+SQLITE_PROGRESS_STEPS = 10000
+
+# driver errors raised by the databases' own statement timeouts
+TIMEOUT_ERROR_MARKERS = (
+    "statement timeout",                        # postgresql statement_timeout
+    "maximum statement execution time",         # mysql MAX_EXECUTION_TIME (3024)
+    "hyt00",                                    # odbc / mssql query timeout
+    "query timeout expired",
+)
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+class QueryCancelled(Exception):
+    pass
+
+
+query_stats = {
+    "executed": 0,
+    "timeouts": 0,
+    "cancelled": 0,
+    "errors": 0,
+}
+_stats_lock = threading.Lock()
+
+
+def record_query(outcome: str):
+    with _stats_lock:
+        query_stats[outcome] += 1
+    queries_total.inc(outcome=outcome)
+
+
+def timeout_for(db_key: str) -> float:
+    return QUERY_TIMEOUTS.get(db_key, QUERY_TIMEOUT_SECONDS)
+
+
+class QueryGuard:
+    """
+    Applies a statement timeout to one connection with the dialect's native
+    mechanism, and lets another thread cancel the running statement:
+
+    - postgresql: SET LOCAL statement_timeout / connection.cancel()
+    - mysql: MAX_EXECUTION_TIME / KILL QUERY from a second connection
+    - sqlite: progress handler checking deadline and cancel flag
+    - mssql (pyodbc): connection.timeout / cursor.cancel()
+
+    The SQLite clock only runs while a statement executes or fetches:
+    streaming callers pause() it between batches, so time spent waiting on
+    a slow client is not counted.
+    """
+
+    def __init__(self, timeout: float | None):
+        self.timeout = timeout if timeout and timeout > 0 else None
+        self.cancelled = False
+        self.timed_out = False
+        self._conn = None
+        self._dbapi = None
+        self._cursor = None
+        self._mysql_id = None
+        self._deadline = None
+        self._elapsed = 0.0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def attach(self, conn):
+        with self._lock:
+            self._conn = conn
+            self._dbapi = conn.connection.dbapi_connection
+        dialect = conn.dialect.name
+
+        event.listen(conn, "before_cursor_execute", self._capture_cursor)
+
+        self._elapsed = 0.0
+        self.resume()
+
+        if dialect == "postgresql" and self.timeout is not None:
+            # scoped to the implicit transaction, reset when the connection returns to the pool
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(self.timeout * 1000)}")
+        elif dialect == "mysql":
+            self._mysql_id = conn.exec_driver_sql("SELECT CONNECTION_ID()").scalar()
+            if self.timeout is not None:
+                conn.exec_driver_sql(
+                    f"SET SESSION MAX_EXECUTION_TIME = {int(self.timeout * 1000)}"
+                )
+        elif dialect == "sqlite":
+            self._dbapi.set_progress_handler(self._sqlite_progress, SQLITE_PROGRESS_STEPS)
+        elif dialect == "mssql" and self.timeout is not None and hasattr(self._dbapi, "timeout"):
+            self._dbapi.timeout = math.ceil(self.timeout)
+
+    def resume(self):
+        """
+        Starts (or restarts) the statement clock with the time left.
+        """
+        if self.timeout is None:
+            return
+        now = time.monotonic()
+        self._started = now
+        self._deadline = now + self.timeout - self._elapsed
+
+    def pause(self):
+        """
+        Stops the statement clock, e.g. between streamed batches.
+        """
+        if self._started is None:
+            return
+        self._elapsed += time.monotonic() - self._started
+        self._started = None
+        self._deadline = None
+
+    def detach(self):
+        conn = self._conn
+        if conn is None:
+            return
+
+        dialect = conn.dialect.name
+        try:
+            event.remove(conn, "before_cursor_execute", self._capture_cursor)
+            if dialect == "sqlite":
+                self._dbapi.set_progress_handler(None, 0)
+            elif dialect == "mysql" and self.timeout is not None:
+                conn.exec_driver_sql("SET SESSION MAX_EXECUTION_TIME = 0")
+            elif dialect == "mssql" and hasattr(self._dbapi, "timeout"):
+                self._dbapi.timeout = 0
+        except Exception as e:
+            logger.warning("query guard reset failed: %r", e)
+        finally:
+            with self._lock:
+                self._conn = None
+                self._dbapi = None
+                self._cursor = None
+
+    def cancel(self):
+        """
+        Cancels the running statement server-side. Safe to call from any thread.
+        """
+        self.cancelled = True
+
+        with self._lock:
+            conn, dbapi, cursor = self._conn, self._dbapi, self._cursor
+
+        if conn is None:
+            return
+
+        dialect = conn.dialect.name
+        try:
+            if dialect == "postgresql" and hasattr(dbapi, "cancel"):
+                dbapi.cancel()
+            elif dialect == "mysql" and self._mysql_id is not None:
+                with conn.engine.connect() as killer:
+                    killer.exec_driver_sql(f"KILL QUERY {int(self._mysql_id)}")
+            elif dialect == "sqlite":
+                dbapi.interrupt()
+            elif cursor is not None and hasattr(cursor, "cancel"):
+                cursor.cancel()
+        except Exception as e:
+            logger.warning("query cancel failed: %r", e)
+
+    def classify(self, exc: Exception) -> Exception:
+        """
+        Maps a driver error caused by cancel() to QueryCancelled, and one
+        caused by a timeout (the SQLite progress handler interrupting, or the
+        database's own statement timeout error) to QueryTimeout; anything
+        else is returned unchanged.
+        """
+        if self.cancelled:
+            return QueryCancelled("Query cancelled")
+        if self.timed_out or (
+            self.timeout is not None
+            and any(marker in str(exc).lower() for marker in TIMEOUT_ERROR_MARKERS)
+        ):
+            return QueryTimeout(f"Query exceeded {self.timeout:g}s timeout")
+        return exc
+
+    def _capture_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            self._cursor = cursor
+
+    def _sqlite_progress(self):
+        if self.cancelled:
+            return 1
+        deadline = self._deadline
+        if deadline is not None and time.monotonic() >= deadline:
+            self.timed_out = True
+            return 1
+        return 0
+
+
+async def run_cancellable(coro, guard: QueryGuard, is_disconnected):
+    """
+    Awaits a query coroutine, cancelling it server-side through `guard`
+    as soon as `is_disconnected()` reports the client went away.
+    """
+    task = asyncio.ensure_future(coro)
+
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=QUERY_DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+
+        if not guard.cancelled and await is_disconnected():
+            logger.info("client disconnected, cancelling query")
+            guard.cancel()
@@ -9,7 +9,8 @@ def format_static_response(
     tables: list[str],
     columns: list[str],
     rows: list[tuple],
-    total_rows: int
+    total_rows: int | None,
+    fetched_rows: int | None = None
 ) -> str:
 
 
@@ -45,7 +46,14 @@ def format_static_response(
     # rows already limited by main.py
     out.append(rows_to_markdown_table(columns, rows))
     
-    if total_rows > len(rows):
+    if total_rows is None:
+        # bounded fetch stopped before the end of the result
+        out.append("")
+        out.append(
+            f"_Showing **first {len(rows)} of more than {fetched_rows} rows**. "
+            "Refine your question to see more specific results._"
+        )
+    elif total_rows > len(rows):
         out.append("")
         out.append(
             f"_Showing **first {len(rows)} of {total_rows} rows**. "
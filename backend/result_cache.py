@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from db_registry import parse_db_overrides
+from schema_cache import on_schema_change
+from sql_metadata import canonicalize_sql
+
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "0") == "1"
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def estimate_result_bytes(columns, rows) -> int:
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+class ResultCache:
+    """
+    TTL + LRU cache of executed query results, keyed by database and
+    canonicalized SQL, bounded by an approximate memory budget in bytes.
+    """
+
+    def __init__(
+        self,
+        default_ttl: int = RESULT_CACHE_TTL_SECONDS,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        ttl_overrides: dict | None = None,
+    ):
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.ttl_overrides = dict(ttl_overrides or {})
+        self._entries = OrderedDict()   # key -> {"result", "bytes", "expires_at"}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def ttl_for(self, db_key: str) -> int:
+        return self.ttl_overrides.get(db_key, self.default_ttl)
+
+    def set_ttl(self, db_key: str, seconds: int):
+        self.ttl_overrides[db_key] = seconds
+
+    def get(self, db_key: str, sql: str, dialect: str, parsed=None):
+        if self.ttl_for(db_key) <= 0:
+            return None
+
+        key = (db_key, canonicalize_sql(sql, dialect, parsed))
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] <= now:
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry["result"]
+
+    def put(self, db_key: str, sql: str, dialect: str, result: tuple, parsed=None) -> bool:
+        """
+        `result` is the (columns, rows, ...) tuple returned by execution.
+        `parsed` is the ParsedSQL of `sql`, if available.
+        """
+        ttl = self.ttl_for(db_key)
+        if ttl <= 0:
+            return False
+
+        size = estimate_result_bytes(result[0], result[1])
+        # never let one huge result flush the whole cache
+        if size > self.max_bytes // 4:
+            return False
+
+        key = (db_key, canonicalize_sql(sql, dialect, parsed))
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = {
+                "result": result,
+                "bytes": size,
+                "expires_at": time.monotonic() + ttl,
+            }
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                old_key = next(iter(self._entries))
+                self._drop(old_key)
+                self.evictions += 1
+
+        return True
+
+    def invalidate_db(self, db_key: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == db_key]:
+                self._drop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+
+
+result_cache = ResultCache(
+    # RESULT_CACHE_TTLS="<connection_uri_hash>=300,..."; 0 disables a database
+    ttl_overrides=parse_db_overrides(os.getenv("RESULT_CACHE_TTLS", ""))
+)
+
+on_schema_change(result_cache.invalidate_db)
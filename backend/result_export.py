@@ -0,0 +1,322 @@
+import csv
+import datetime
+import io
+import os
+import uuid
+from decimal import Decimal
+
+from query_guard import QueryGuard
+from row_stream import RowStream
+from sql_rewriter import apply_row_limit
+from telemetry import logger
+
+# Arrow IPC / Parquet exports need pyarrow (optional); CSV always works
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+EXPORT_MAX_ROWS = int(os.getenv("EXPORT_MAX_ROWS", "1000000"))
+EXPORT_MAX_BYTES = int(os.getenv("EXPORT_MAX_BYTES", str(512 * 1024 * 1024)))
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "5000"))
+# exports read far more rows than a chat answer, so they get their own timeout
+EXPORT_TIMEOUT_SECONDS = float(os.getenv("EXPORT_TIMEOUT_SECONDS", "300"))
+
+EXPORT_FORMATS = {
+    # format: (media type, file extension)
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailable(Exception):
+    pass
+
+
+class ExportTruncated(Exception):
+    """
+    Raised from the body once a cap is reached. Headers are already sent,
+    so the response is cut off (no final chunk): clients see an incomplete
+    download instead of a well-formed but silently truncated file.
+    """
+
+
+def check_format(fmt: str):
+    """
+    Raises ValueError for unknown formats, ExportUnavailable when the
+    format needs pyarrow and it is not installed.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt != "csv" and pa is None:
+        raise ExportUnavailable(f"{fmt} export requires pyarrow")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).hex()
+    return value
+
+
+class CsvEncoder:
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return self._encode([self.columns])
+
+    def batch(self, rows) -> bytes:
+        return self._encode([[_csv_value(v) for v in row] for row in rows])
+
+    def close(self) -> bytes:
+        return b""
+
+    def _encode(self, rows) -> bytes:
+        buf = io.StringIO()
+        csv.writer(buf).writerows(rows)
+        return buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """
+    Write-only file for pyarrow writers; chunks are taken out after every
+    batch so the encoded output never accumulates.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_value(value):
+    if isinstance(value, memoryview):
+        return bytes(value)
+    return value
+
+
+def _arrow_type(type_code):
+    """
+    Arrow type for a DB-API type_code, for drivers that report Python types
+    (pyodbc); None when the code says nothing usable (sqlite, OIDs, ...).
+    Decimals and UUIDs stay exact as text.
+    """
+    if not isinstance(type_code, type):
+        return None
+    if issubclass(type_code, bool):
+        return pa.bool_()
+    if issubclass(type_code, int):
+        return pa.int64()
+    if issubclass(type_code, float):
+        return pa.float64()
+    if issubclass(type_code, (str, Decimal, uuid.UUID)):
+        return pa.string()
+    if issubclass(type_code, datetime.datetime):
+        return pa.timestamp("us")
+    if issubclass(type_code, datetime.date):
+        return pa.date32()
+    if issubclass(type_code, datetime.time):
+        return pa.time64("us")
+    if issubclass(type_code, (bytes, bytearray, memoryview)):
+        return pa.binary()
+    return None
+
+
+def _inferred_type(col):
+    """
+    Arrow type from a batch's values; all NULL or decimal columns become
+    strings (a batch's decimals can need more digits than the first).
+    """
+    kind = pa.array(col).type if col else pa.null()
+    if pa.types.is_null(kind):
+        return pa.string()
+    if isinstance(next((v for v in col if v is not None), None), Decimal):
+        return pa.string()
+    return kind
+
+
+def _cast_value(value, kind):
+    if value is None:
+        return None
+    if pa.types.is_string(kind):
+        return str(value)
+    try:
+        # safe cast: 3.5 into an integer column does not fit, it is not rounded
+        return pa.scalar(value).cast(kind).as_py()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        pass
+    try:
+        # e.g. "12" in an integer column (SQLite types per value, not per column)
+        return pa.scalar(str(value)).cast(kind).as_py()
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+        return _UNCAST
+
+
+_UNCAST = object()
+
+
+class ArrowEncoder:
+    """
+    Arrow IPC stream or Parquet (one row group per batch). Column types come
+    from the cursor description where the driver reports them, otherwise
+    from the first batch. Every batch is cast to that schema, so a later
+    batch with other value types cannot fail the stream halfway; values
+    that do not fit their column are written as NULL (and logged).
+    """
+
+    def __init__(self, columns, fmt: str, column_types=None):
+        self.columns = columns
+        self.fmt = fmt
+        self.column_types = column_types or [None] * len(columns)
+        self.schema = None
+        self.writer = None
+        self.sink = _ChunkSink()
+        self.uncast = 0
+
+    def header(self) -> bytes:
+        return b""
+
+    def batch(self, rows) -> bytes:
+        values = [[_arrow_value(v) for v in col] for col in zip(*rows)]
+        if self.schema is None:
+            self._open(values)
+
+        arrays = [self._array(col, field.type) for field, col in zip(self.schema, values)]
+        record_batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+        self.writer.write_batch(record_batch)
+        return self.sink.take()
+
+    def close(self) -> bytes:
+        if self.writer is None:
+            # no rows: still a valid, empty file
+            self._open([[] for _ in self.columns])
+        self.writer.close()
+        if self.uncast:
+            logger.warning("export wrote %d values that did not fit their column type as NULL", self.uncast)
+        return self.sink.take()
+
+    def _array(self, col, kind):
+        if pa.types.is_string(kind):
+            return pa.array([None if v is None else str(v) for v in col], type=kind)
+        try:
+            return pa.array(col, type=kind)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+            pass
+
+        cast = []
+        for value in col:
+            value = _cast_value(value, kind)
+            if value is _UNCAST:
+                self.uncast += 1
+                value = None
+            cast.append(value)
+        return pa.array(cast, type=kind)
+
+    def _open(self, values):
+        fields = []
+        for name, type_code, col in zip(self.columns, self.column_types, values):
+            kind = _arrow_type(type_code) or _inferred_type(col)
+            fields.append(pa.field(name, kind))
+        self.schema = pa.schema(fields)
+
+        sink = pa.PythonFile(self.sink, mode="w")
+        if self.fmt == "parquet":
+            self.writer = pq.ParquetWriter(sink, self.schema)
+        else:
+            self.writer = pa.ipc.new_stream(sink, self.schema)
+
+
+def make_encoder(columns, fmt: str, column_types=None):
+    if fmt == "csv":
+        return CsvEncoder(columns)
+    return ArrowEncoder(columns, fmt, column_types)
+
+
+async def start_export(engine, sql: str, dialect: str, parsed=None):
+    """
+    Re-executes `sql` with a server-side cursor and fetches the first
+    batch, so database errors surface before any byte is sent.
+    Returns (stream, first_batch).
+    """
+    exec_sql = apply_row_limit(sql, dialect, EXPORT_MAX_ROWS + 1, parsed)
+    stream = RowStream(
+        engine, exec_sql,
+        max_rows=EXPORT_MAX_ROWS,
+        batch_rows=EXPORT_BATCH_ROWS,
+        count_total=False,
+        dialect=dialect,
+        guard=QueryGuard(EXPORT_TIMEOUT_SECONDS),
+        keep_rows=False
+    )
+    first_batch = await stream.start()
+    return stream, first_batch
+
+
+async def export_chunks(stream: RowStream, batch, fmt: str):
+    """
+    Yields the encoded export chunk by chunk. Only one batch is in memory
+    at a time and the next one is fetched after the previous chunk was sent
+    (backpressure). A result over EXPORT_MAX_ROWS rows / EXPORT_MAX_BYTES
+    bytes raises ExportTruncated at the cap instead of ending the file;
+    a client that goes away closes the generator, which cancels the statement.
+    """
+    encoder = make_encoder(stream.columns, fmt, stream.column_types)
+    chunk = encoder.header()
+    sent = 0
+
+    try:
+        while True:
+            if batch:
+                chunk += encoder.batch(batch)
+            if chunk:
+                sent += len(chunk)
+                yield chunk
+                chunk = b""
+
+            if stream.done:
+                break
+            if sent >= EXPORT_MAX_BYTES:
+                logger.warning(
+                    "export cut off at the %d byte cap (%d rows)", EXPORT_MAX_BYTES, stream.row_count
+                )
+                raise ExportTruncated(f"export exceeds {EXPORT_MAX_BYTES} bytes")
+            batch = await stream.next_batch()
+
+        if stream.total_rows is None:
+            logger.warning("export cut off at the %d row cap", EXPORT_MAX_ROWS)
+            raise ExportTruncated(f"export exceeds {EXPORT_MAX_ROWS} rows")
+
+        tail = encoder.close()
+        if tail:
+            yield tail
+    finally:
+        stream.close()
@@ -0,0 +1,178 @@
+import datetime
+import os
+from collections import Counter
+from decimal import Decimal
+
+import numpy as np
+
+from schema_serializer import estimate_tokens
+
+
+# Token budget for the result digest sent to the answer prompt
+RESULT_DIGEST_TOKEN_BUDGET = int(os.getenv("RESULT_DIGEST_TOKEN_BUDGET", "600"))
+RESULT_SAMPLE_ROWS = int(os.getenv("RESULT_SAMPLE_ROWS", "5"))
+RESULT_TOP_K = 3
+MAX_VALUE_CHARS = 40
+
+
+def display_value(value) -> str:
+    """
+    Compact text for a result value (no Decimal(...) / datetime(...) reprs).
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return str(value).lower()
+    if isinstance(value, (float, Decimal)):
+        return f"{float(value):.6g}"
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+
+    text = str(value).replace("\n", " ")
+    if len(text) > MAX_VALUE_CHARS:
+        text = text[:MAX_VALUE_CHARS - 1] + "…"
+    return text
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def column_stats(name: str, values, top_k: int = RESULT_TOP_K) -> dict:
+    """
+    count, distinct, null ratio and top-k for any column; min / max / mean
+    for numeric ones (NaN-aware NumPy reductions over float64, NULL as NaN),
+    min / max for dates.
+    """
+    total = len(values)
+    present = [v for v in values if v is not None]
+
+    stats = {
+        "name": name,
+        "count": len(present),
+        "null_ratio": (total - len(present)) / total if total else 0.0,
+        "kind": "empty",
+    }
+    if not present:
+        return stats
+
+    try:
+        counts = Counter(present)
+    except TypeError:
+        # unhashable driver types (arrays, json): compare their text
+        counts = Counter(display_value(v) for v in present)
+    stats["distinct"] = len(counts)
+
+    if all(_is_number(v) for v in present):
+        numbers = np.array(values, dtype=np.float64)  # None -> NaN
+        if np.isnan(numbers).all():
+            # only NaN values (floats / Decimal('NaN')): nothing to order
+            stats.update(kind="number", min=np.nan, max=np.nan, mean=np.nan)
+        else:
+            stats.update(
+                kind="number",
+                # the original values, so Decimal / int extremes print exactly
+                min=values[int(np.nanargmin(numbers))],
+                max=values[int(np.nanargmax(numbers))],
+                mean=float(np.nanmean(numbers)),
+            )
+    elif all(isinstance(v, (datetime.date, datetime.datetime)) for v in present):
+        dates = present
+        try:
+            stats.update(kind="date", min=min(dates), max=max(dates))
+        except TypeError:
+            # date mixed with datetime, or naive with aware: ISO text orders the same
+            stats.update(kind="date", min=min(dates, key=display_value), max=max(dates, key=display_value))
+    else:
+        stats["kind"] = "text"
+
+    # top values only say something when values repeat
+    if stats["distinct"] < stats["count"]:
+        stats["top"] = counts.most_common(top_k)
+
+    return stats
+
+
+def summarize_result(columns, rows, top_k: int = RESULT_TOP_K) -> list:
+    """
+    Per-column stats over all fetched rows (one pass per column).
+    """
+    if not rows:
+        return [column_stats(name, [], top_k) for name in columns]
+    return [
+        column_stats(name, list(values), top_k)
+        for name, values in zip(columns, zip(*rows))
+    ]
+
+
+def _stats_line(stats: dict) -> str:
+    parts = [stats["kind"]]
+    if "distinct" in stats:
+        parts.append(f"{stats['distinct']} distinct")
+    if stats["kind"] in ("number", "date"):
+        parts.append(f"min {display_value(stats['min'])}")
+        parts.append(f"max {display_value(stats['max'])}")
+    if stats["kind"] == "number":
+        parts.append(f"mean {stats['mean']:.6g}")
+    if stats["null_ratio"]:
+        parts.append(f"{stats['null_ratio']:.0%} null")
+    if stats.get("top"):
+        parts.append("top: " + ", ".join(
+            f"{display_value(value)} ({count})" for value, count in stats["top"]
+        ))
+    return f"- {stats['name']}: " + ", ".join(parts)
+
+
+def result_digest(
+    columns,
+    rows,
+    total_rows: int | None = None,
+    token_budget: int = RESULT_DIGEST_TOKEN_BUDGET,
+    sample_rows: int = RESULT_SAMPLE_ROWS,
+) -> str:
+    """
+    Token-budgeted text for the answer prompt: row count, one stats line per
+    column and a few sample rows. `total_rows` None means the result was
+    larger than the fetched rows.
+    """
+    if total_rows is None:
+        count_line = f"Rows: more than {len(rows)} (stats cover the first {len(rows)})"
+    else:
+        count_line = f"Rows: {total_rows}"
+        if total_rows > len(rows):
+            count_line += f" (stats cover the first {len(rows)})"
+
+    lines = [count_line, "Columns:"]
+    used = estimate_tokens(count_line) + 3
+
+    stats_lines = [_stats_line(s) for s in summarize_result(columns, rows)]
+    for i, line in enumerate(stats_lines):
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            lines.append(f"- … {len(stats_lines) - i} more columns")
+            return "\n".join(lines)
+        lines.append(line)
+        used += cost
+
+    sample = rows[:sample_rows]
+    if not sample:
+        return "\n".join(lines)
+
+    header = f"Sample ({len(sample)} rows):"
+    column_line = " | ".join(columns)
+    used += estimate_tokens(header) + estimate_tokens(column_line) + 2
+    if used > token_budget:
+        return "\n".join(lines)
+
+    lines.extend([header, column_line])
+    for row in sample:
+        line = " | ".join(display_value(v) for v in row)
+        cost = estimate_tokens(line) + 1
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+
+    return "\n".join(lines)
@@ -0,0 +1,213 @@
+import os
+import threading
+
+from sqlalchemy import text
+
+from llm_utils import QUERY_COUNT_TOTAL, QUERY_MAX_FETCH_ROWS, db_executor, run_blocking
+from query_guard import QueryCancelled, QueryGuard, QueryTimeout, record_query
+from sql_metadata import build_count_sql
+from telemetry import logger
+
+
+# Rows per batch when results are streamed to the client as they are fetched
+QUERY_STREAM_BATCH_ROWS = int(os.getenv("QUERY_STREAM_BATCH_ROWS", "100"))
+
+
+class RowStream:
+    """
+    Bounded execution read batch by batch from a server-side cursor (where
+    the dialect supports one). Every step runs on the db executor; the next
+    batch is only fetched when the caller asks for it, so a slow client
+    slows the cursor down instead of buffering the result.
+
+    At most `max_rows` rows are fetched; total_rows is None when the result
+    was larger and not counted ("more than max_rows"). `count_from` is the
+    SQL to count (defaults to `sql`), e.g. the query before a row limit was
+    injected. `rows` keeps every row handed out so far, unless
+    `keep_rows` is False (exports: only the current batch is in memory).
+    """
+
+    def __init__(
+        self,
+        engine,
+        sql: str,
+        *,
+        max_rows: int = QUERY_MAX_FETCH_ROWS,
+        batch_rows: int | None = QUERY_STREAM_BATCH_ROWS,
+        count_total: bool = QUERY_COUNT_TOTAL,
+        dialect: str | None = None,
+        count_from: str | None = None,
+        guard: QueryGuard | None = None,
+        keep_rows: bool = True
+    ):
+        self.engine = engine
+        self.sql = sql
+        self.max_rows = max_rows
+        # None reads the whole budget in one fetch
+        self.batch_rows = batch_rows or max_rows + 1
+        self.count_total = count_total
+        self.dialect = dialect or engine.dialect.name
+        self.count_from = count_from
+        self.guard = guard
+        self.keep_rows = keep_rows
+
+        self.columns = []
+        # DB-API type_code per column (driver specific, may be None)
+        self.column_types = []
+        self.rows = []
+        self.row_count = 0
+        self.total_rows = None
+        self.done = False
+
+        self._conn = None
+        self._result = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_result(cls, columns, rows, total_rows):
+        """
+        An already finished stream, e.g. for a result cache hit.
+        """
+        stream = cls.__new__(cls)
+        stream.columns = list(columns)
+        stream.column_types = [None] * len(stream.columns)
+        stream.rows = list(rows)
+        stream.row_count = len(stream.rows)
+        stream.total_rows = total_rows
+        stream.done = True
+        stream.guard = None
+        stream._conn = None
+        stream._result = None
+        stream._lock = threading.Lock()
+        return stream
+
+    async def start(self) -> list:
+        """
+        Executes the query and fetches the first batch (returned).
+        Guard errors surface as QueryTimeout / QueryCancelled.
+        """
+        await run_blocking(self._open)
+        return await self.next_batch()
+
+    async def next_batch(self) -> list:
+        """
+        The next rows; an empty list once the stream is done.
+        """
+        if self.done:
+            return []
+        return await run_blocking(self._fetch)
+
+    def close(self):
+        """
+        Stops an unfinished stream: cancels the statement server-side and
+        returns the connection to the pool. Safe to call at any time.
+        """
+        if self.done or self._conn is None:
+            return
+        if self.guard is not None:
+            self.guard.cancel()
+        # waits (on the executor) for an in-flight fetch to give up the connection
+        db_executor.submit(self._release)
+
+    def _open(self):
+        with self._lock:
+            conn = self.engine.connect()
+            self._conn = conn
+            try:
+                if self.guard is not None:
+                    self.guard.attach(conn)
+                if conn.dialect.supports_server_side_cursors:
+                    conn = conn.execution_options(stream_results=True)
+
+                self._result = conn.execute(text(self.sql))
+                self.columns = [
+                    col.split(".")[-1] if "." in col else col
+                    for col in self._result.keys()
+                ]
+                description = getattr(self._result.cursor, "description", None) or ()
+                self.column_types = [d[1] for d in description] or [None] * len(self.columns)
+                # the statement clock only runs while we execute / fetch
+                self._pause_clock()
+            except Exception as e:
+                self._fail(e)
+
+    def _fetch(self) -> list:
+        with self._lock:
+            if self.done:
+                return []
+            try:
+                self._resume_clock()
+                # one row past the budget tells us whether it was exceeded
+                want = min(self.batch_rows, self.max_rows + 1 - self.row_count)
+                batch = self._result.fetchmany(want)
+                self._pause_clock()
+
+                exceeded = self.row_count + len(batch) > self.max_rows
+                if exceeded:
+                    batch = batch[:self.max_rows - self.row_count]
+                self.row_count += len(batch)
+                if self.keep_rows:
+                    self.rows.extend(batch)
+
+                if exceeded:
+                    self.total_rows = self._count() if self.count_total else None
+                    self._finish()
+                elif len(batch) < want:
+                    self.total_rows = self.row_count
+                    self._finish()
+                return batch
+            except Exception as e:
+                self._fail(e)
+
+    def _resume_clock(self):
+        if self.guard is not None:
+            self.guard.resume()
+
+    def _pause_clock(self):
+        if self.guard is not None:
+            self.guard.pause()
+
+    def _count(self):
+        try:
+            self._result.close()
+            count_sql = build_count_sql(self.count_from or self.sql, self.dialect)
+            self._resume_clock()
+            return self._conn.execute(text(count_sql)).scalar()
+        except Exception as e:
+            logger.warning("row count failed: %r", e)
+            return None
+
+    def _finish(self):
+        self._close_connection()
+        record_query("executed")
+
+    def _fail(self, e: Exception):
+        mapped = self.guard.classify(e) if self.guard is not None else e
+        if isinstance(mapped, QueryTimeout):
+            record_query("timeouts")
+        elif isinstance(mapped, QueryCancelled):
+            record_query("cancelled")
+        else:
+            record_query("errors")
+
+        self._close_connection()
+        if mapped is e:
+            raise e
+        raise mapped from e
+
+    def _release(self):
+        with self._lock:
+            if not self.done and self._conn is not None:
+                self._close_connection()
+                record_query("cancelled")
+
+    def _close_connection(self):
+        self.done = True
+        conn, self._conn, self._result = self._conn, None, None
+        if conn is None:
+            return
+        try:
+            if self.guard is not None:
+                self.guard.detach()
+        finally:
+            conn.close()
@@ -1,36 +1,206 @@
-from sqlalchemy import inspect
-from collections import defaultdict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
 
+from sqlalchemy import inspect, text
 
-def get_schema_for_db(cache_key: str, engine):
-    inspector = inspect(engine)
+from telemetry import logger, cache_events
+
+
+SCHEMA_CACHE_PATH = os.getenv("SCHEMA_CACHE_PATH", "data/schema_cache.db")
+SCHEMA_CACHE_MAX_ENTRIES = int(os.getenv("SCHEMA_CACHE_MAX_ENTRIES", "64"))
+# upper bound on a cached schema's age, fingerprint or not
+SCHEMA_CACHE_TTL_SECONDS = int(os.getenv("SCHEMA_CACHE_TTL_SECONDS", "3600"))
+# how often a cached schema is re-validated against the catalog fingerprint
+SCHEMA_CACHE_CHECK_SECONDS = int(os.getenv("SCHEMA_CACHE_CHECK_SECONDS", "60"))
+
+
+# One cheap catalog query per dialect; its result changes whenever tables,
+# columns or foreign keys change.
+FINGERPRINT_QUERIES = {
+    "sqlite": """
+        SELECT type, name, tbl_name, sql
+        FROM sqlite_master
+        ORDER BY type, name
+    """,
+    "postgresql": """
+        SELECT
+            (SELECT md5(string_agg(
+                table_schema || '.' || table_name || '.' || column_name
+                    || ':' || data_type || ':' || is_nullable,
+                ',' ORDER BY table_schema, table_name, ordinal_position))
+             FROM information_schema.columns
+             WHERE table_schema NOT IN ('pg_catalog', 'information_schema')),
+            (SELECT count(*) || ':' || coalesce(max(oid::text::bigint), 0)
+             FROM pg_constraint WHERE contype = 'f')
+    """,
+    "mssql": """
+        SELECT COUNT(*), MAX(modify_date)
+        FROM sys.objects
+        WHERE type IN ('U', 'V', 'F')
+    """,
+    # order-independent 64-bit hash per row set; GROUP_CONCAT would be
+    # truncated at group_concat_max_len
+    "mysql": """
+        SELECT
+            (SELECT CONCAT(COUNT(*), ':', BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS('.',
+                    TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, COLUMN_TYPE, IS_NULLABLE)),
+                16), 16, 10) AS UNSIGNED)))
+             FROM information_schema.COLUMNS
+             WHERE TABLE_SCHEMA = DATABASE()),
+            (SELECT CONCAT(COUNT(*), ':', BIT_XOR(CAST(CONV(LEFT(MD5(CONCAT_WS('.',
+                    TABLE_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME)),
+                16), 16, 10) AS UNSIGNED)))
+             FROM information_schema.KEY_COLUMN_USAGE
+             WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IS NOT NULL)
+    """,
+}
+
+
+SYSTEM_SCHEMAS = ("sys", "information_schema", "mysql", "performance_schema")
+
+
+# Set-based catalog queries for dialects whose SQLAlchemy inspector still
+# reflects one table at a time. Each returns rows ordered for stable output.
+BULK_CATALOG_QUERIES = {
+    "sqlite": {
+        "columns": """
+            SELECT 'main', m.name, p.name
+            FROM sqlite_master m
+            JOIN pragma_table_info(m.name) p
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.name, p.cid
+        """,
+        "foreign_keys": """
+            SELECT
+                'main', m.name, f."from",
+                'main', f."table",
+                COALESCE(f."to", (
+                    SELECT t.name FROM pragma_table_info(f."table") t
+                    WHERE t.pk = f.seq + 1
+                ))
+            FROM sqlite_master m
+            JOIN pragma_foreign_key_list(m.name) f
+            WHERE m.type = 'table' AND m.name NOT LIKE 'sqlite_%'
+            ORDER BY m.name, f.id, f.seq
+        """,
+    },
+    "mssql": {
+        "columns": """
+            SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS c
+            JOIN INFORMATION_SCHEMA.TABLES t
+              ON t.TABLE_SCHEMA = c.TABLE_SCHEMA
+             AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE t.TABLE_TYPE = 'BASE TABLE'
+              AND c.TABLE_SCHEMA NOT IN ('sys', 'INFORMATION_SCHEMA')
+            ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+        """,
+        "foreign_keys": """
+            SELECT
+                OBJECT_SCHEMA_NAME(fkc.parent_object_id),
+                OBJECT_NAME(fkc.parent_object_id),
+                pc.name,
+                OBJECT_SCHEMA_NAME(fkc.referenced_object_id),
+                OBJECT_NAME(fkc.referenced_object_id),
+                rc.name
+            FROM sys.foreign_key_columns fkc
+            JOIN sys.columns pc
+              ON pc.object_id = fkc.parent_object_id
+             AND pc.column_id = fkc.parent_column_id
+            JOIN sys.columns rc
+              ON rc.object_id = fkc.referenced_object_id
+             AND rc.column_id = fkc.referenced_column_id
+            ORDER BY fkc.constraint_object_id, fkc.constraint_column_id
+        """,
+    },
+    "mysql": {
+        "columns": """
+            SELECT c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME
+            FROM information_schema.COLUMNS c
+            JOIN information_schema.TABLES t
+              ON t.TABLE_SCHEMA = c.TABLE_SCHEMA
+             AND t.TABLE_NAME = c.TABLE_NAME
+            WHERE t.TABLE_TYPE = 'BASE TABLE'
+              AND c.TABLE_SCHEMA NOT IN
+                  ('sys', 'information_schema', 'mysql', 'performance_schema')
+            ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION
+        """,
+        "foreign_keys": """
+            SELECT
+                TABLE_SCHEMA, TABLE_NAME, COLUMN_NAME,
+                REFERENCED_TABLE_SCHEMA, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME
+            FROM information_schema.KEY_COLUMN_USAGE
+            WHERE REFERENCED_TABLE_NAME IS NOT NULL
+              AND TABLE_SCHEMA NOT IN
+                  ('sys', 'information_schema', 'mysql', 'performance_schema')
+            ORDER BY TABLE_SCHEMA, TABLE_NAME, CONSTRAINT_NAME, ORDINAL_POSITION
+        """,
+    },
+}
 
-    schema_info = {
-        "tables": {},
-        "foreign_keys": []
-    }
 
-    # 1️⃣ Detect schemas safely
+def qualified_name(schema, table):
+    return f"{schema}.{table}" if schema else table
+
+
+def _fk_entries(source_table: str, fk: dict):
+    if not fk.get("referred_table"):
+        return []
+
+    source_cols = fk.get("constrained_columns", [])
+    target_cols = fk.get("referred_columns", [])
+    target_table = qualified_name(fk.get("referred_schema"), fk["referred_table"])
+
+    return [
+        {
+            "source_table": source_table,
+            "source_column": src_col,
+            "target_table": target_table,
+            "target_column": tgt_col
+        }
+        for src_col, tgt_col in zip(source_cols, target_cols)
+    ]
+
+
+def _schema_names(inspector):
     try:
         schemas = inspector.get_schema_names()
     except Exception:
         # SQLite / MySQL fallback
         schemas = [None]
 
-    for schema in schemas:
-        # Skip system schemas where applicable
-        if schema and schema.lower() in ("sys", "information_schema"):
-            continue
+    return [
+        schema for schema in schemas
+        if not (schema and schema.lower() in SYSTEM_SCHEMAS)
+    ]
+
+
+def introspect_schema_per_table(engine):
+    """
+    Original Inspector walk: O(tables) catalog round trips.
+    Kept as the fallback for dialects where the bulk paths fail.
+    """
+    inspector = inspect(engine)
+
+    schema_info = {
+        "tables": {},
+        "foreign_keys": []
+    }
 
+    for schema in _schema_names(inspector):
         try:
             tables = inspector.get_table_names(schema=schema)
         except Exception:
             continue
 
         for table in tables:
-            full_table_name = f"{schema}.{table}" if schema else table
+            full_table_name = qualified_name(schema, table)
 
-            # 2️⃣ Columns
             try:
                 columns = inspector.get_columns(table, schema=schema)
                 schema_info["tables"][full_table_name] = [
@@ -39,30 +209,309 @@ def get_schema_for_db(cache_key: str, engine):
             except Exception:
                 continue
 
-            # 3️⃣ Foreign Keys
             try:
-                fks = inspector.get_foreign_keys(table, schema=schema)
-                for fk in fks:
-                    if not fk.get("referred_table"):
-                        continue
-
-                    source_cols = fk.get("constrained_columns", [])
-                    target_cols = fk.get("referred_columns", [])
-
-                    target_schema = fk.get("referred_schema")
-                    target_table = fk.get("referred_table")
-
-                    for src_col, tgt_col in zip(source_cols, target_cols):
-                        schema_info["foreign_keys"].append({
-                            "source_table": full_table_name,
-                            "source_column": src_col,
-                            "target_table": (
-                                f"{target_schema}.{target_table}"
-                                if target_schema else target_table
-                            ),
-                            "target_column": tgt_col
-                        })
+                for fk in inspector.get_foreign_keys(table, schema=schema):
+                    schema_info["foreign_keys"].extend(
+                        _fk_entries(full_table_name, fk)
+                    )
             except Exception:
                 continue
 
     return schema_info
+
+
+def introspect_schema_multi(engine):
+    """
+    SQLAlchemy 2.x get_multi_columns / get_multi_foreign_keys:
+    one reflection call per schema (set-based on PostgreSQL / Oracle).
+    """
+    inspector = inspect(engine)
+    if not hasattr(inspector, "get_multi_columns"):
+        raise NotImplementedError("Inspector has no get_multi_* API")
+
+    schema_info = {
+        "tables": {},
+        "foreign_keys": []
+    }
+
+    for schema in _schema_names(inspector):
+        multi_columns = inspector.get_multi_columns(schema=schema)
+        multi_fks = inspector.get_multi_foreign_keys(schema=schema)
+
+        for (table_schema, table), columns in multi_columns.items():
+            schema_info["tables"][qualified_name(table_schema or schema, table)] = [
+                col["name"] for col in columns
+            ]
+
+        for (table_schema, table), fks in multi_fks.items():
+            full_table_name = qualified_name(table_schema or schema, table)
+            for fk in fks:
+                schema_info["foreign_keys"].extend(_fk_entries(full_table_name, fk))
+
+    return schema_info
+
+
+def introspect_schema_catalog(engine):
+    """
+    Two set-based catalog queries (columns, foreign keys) for the whole database.
+    """
+    queries = BULK_CATALOG_QUERIES[engine.dialect.name]
+
+    schema_info = {
+        "tables": {},
+        "foreign_keys": []
+    }
+
+    with engine.connect() as conn:
+        for table_schema, table, column in conn.execute(text(queries["columns"])):
+            schema_info["tables"].setdefault(
+                qualified_name(table_schema, table), []
+            ).append(column)
+
+        for row in conn.execute(text(queries["foreign_keys"])):
+            src_schema, src_table, src_col, tgt_schema, tgt_table, tgt_col = row
+            schema_info["foreign_keys"].append({
+                "source_table": qualified_name(src_schema, src_table),
+                "source_column": src_col,
+                "target_table": qualified_name(tgt_schema, tgt_table),
+                "target_column": tgt_col
+            })
+
+    return schema_info
+
+
+def introspect_schema(engine):
+    """
+    Bulk introspection with per-table Inspector calls as the fallback.
+    """
+    if engine.dialect.name in BULK_CATALOG_QUERIES:
+        loaders = (introspect_schema_catalog, introspect_schema_multi)
+    else:
+        loaders = (introspect_schema_multi,)
+
+    for loader in loaders:
+        try:
+            return loader(engine)
+        except Exception as e:
+            logger.warning("schema bulk load via %s failed: %r", loader.__name__, e)
+
+    return introspect_schema_per_table(engine)
+
+
+def schema_fingerprint(engine) -> str | None:
+    """
+    Hash of a single cheap catalog query.
+    Returns None when the dialect has no supported check.
+    """
+    query = FINGERPRINT_QUERIES.get(engine.dialect.name)
+    if query is None:
+        return None
+
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(query)).fetchall()
+    except Exception:
+        return None
+
+    return hashlib.sha256(repr([tuple(r) for r in rows]).encode()).hexdigest()
+
+
+class SchemaDiskStore:
+    """
+    Small SQLite file holding the last introspected schema per cache key,
+    so restarts don't start cold.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._ready:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    fingerprint TEXT,
+                    fetched_at REAL NOT NULL,
+                    schema_json TEXT NOT NULL
+                )
+            """)
+            self._ready = True
+        return conn
+
+    def load(self, cache_key: str):
+        try:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT fingerprint, fetched_at, schema_json "
+                    "FROM schema_cache WHERE cache_key = ?",
+                    (cache_key,)
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+
+        if row is None:
+            return None
+
+        fingerprint, fetched_at, schema_json = row
+        return {
+            "schema": json.loads(schema_json),
+            "fingerprint": fingerprint,
+            "fetched_at": fetched_at,
+            "checked_at": 0.0,
+        }
+
+    def save(self, cache_key: str, entry: dict):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO schema_cache "
+                    "(cache_key, fingerprint, fetched_at, schema_json) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        cache_key,
+                        entry["fingerprint"],
+                        entry["fetched_at"],
+                        json.dumps(entry["schema"]),
+                    )
+                )
+        except sqlite3.Error:
+            pass
+
+    def delete(self, cache_key: str):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "DELETE FROM schema_cache WHERE cache_key = ?",
+                    (cache_key,)
+                )
+        except sqlite3.Error:
+            pass
+
+
+class SchemaCache:
+    """
+    In-process LRU of introspected schemas backed by SchemaDiskStore.
+
+    A cached schema is re-validated at most every `check_seconds` using the
+    dialect's catalog fingerprint, and re-introspected when that fingerprint
+    changed or the schema is older than `ttl_seconds` (a fingerprint can
+    miss a change, e.g. one the catalog query does not cover).
+    """
+
+    def __init__(
+        self,
+        disk_store: SchemaDiskStore | None,
+        max_entries: int = SCHEMA_CACHE_MAX_ENTRIES,
+        ttl_seconds: int = SCHEMA_CACHE_TTL_SECONDS,
+        check_seconds: int = SCHEMA_CACHE_CHECK_SECONDS,
+    ):
+        self.disk_store = disk_store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.check_seconds = check_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = defaultdict(threading.Lock)
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """
+        `callback(cache_key)` runs whenever a cached schema is invalidated
+        or re-introspected with a different result.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, cache_key: str):
+        for callback in self._listeners:
+            try:
+                callback(cache_key)
+            except Exception as e:
+                logger.warning("schema cache listener failed: %r", e)
+
+    def get(self, cache_key: str, engine, force_refresh: bool = False):
+        # one loader per key, concurrent questions wait for the same introspection
+        with self._lock:
+            key_lock = self._key_locks[cache_key]
+
+        with key_lock:
+            entry = None if force_refresh else self._lookup(cache_key)
+            now = time.time()
+            fingerprint = None
+
+            if entry is not None:
+                if now - entry["checked_at"] < self.check_seconds:
+                    cache_events.inc(cache="schema", result="hit")
+                    return entry["schema"]
+
+                fingerprint = schema_fingerprint(engine)
+                unchanged = fingerprint is None or fingerprint == entry["fingerprint"]
+
+                if unchanged and now - entry["fetched_at"] < self.ttl_seconds:
+                    entry["checked_at"] = now
+                    cache_events.inc(cache="schema", result="hit")
+                    return entry["schema"]
+            else:
+                fingerprint = schema_fingerprint(engine)
+
+            cache_events.inc(cache="schema", result="miss")
+            previous = entry
+            entry = {
+                "schema": introspect_schema(engine),
+                "fingerprint": fingerprint,
+                "fetched_at": now,
+                "checked_at": now,
+            }
+            self._remember(cache_key, entry)
+            if self.disk_store is not None:
+                self.disk_store.save(cache_key, entry)
+
+            if previous is not None and previous["schema"] != entry["schema"]:
+                self._notify(cache_key)
+
+            return entry["schema"]
+
+    def invalidate(self, cache_key: str):
+        with self._lock:
+            self._entries.pop(cache_key, None)
+        if self.disk_store is not None:
+            self.disk_store.delete(cache_key)
+        self._notify(cache_key)
+
+    def _lookup(self, cache_key: str):
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return entry
+
+        if self.disk_store is None:
+            return None
+
+        entry = self.disk_store.load(cache_key)
+        if entry is not None:
+            self._remember(cache_key, entry)
+        return entry
+
+    def _remember(self, cache_key: str, entry: dict):
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+schema_cache = SchemaCache(SchemaDiskStore(SCHEMA_CACHE_PATH))
+
+
+def get_schema_for_db(cache_key: str, engine, force_refresh: bool = False):
+    return schema_cache.get(cache_key, engine, force_refresh=force_refresh)
+
+
+def invalidate_schema(cache_key: str):
+    schema_cache.invalidate(cache_key)
+
+
+def on_schema_change(callback):
+    schema_cache.add_listener(callback)
@@ -0,0 +1,279 @@
+import json
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from schema_serializer import SCHEMA_TOKEN_BUDGET, serialize_schema
+from schema_trimmer import extract_keywords, split_identifier
+from sql_cache import schema_content_key
+from telemetry import logger
+
+
+# "llm": original prune_schema LLM round trip
+# "local": rank / drop tables with the vector index (no LLM call); opt-in
+# until it has been checked against more real questions
+SCHEMA_PRUNE_MODE = os.getenv("SCHEMA_PRUNE_MODE", "llm")
+SCHEMA_VECTOR_DIR = os.getenv("SCHEMA_VECTOR_DIR", "data/schema_vectors")
+# vector files kept on disk, least recently used removed first
+SCHEMA_VECTOR_MAX_FILES = int(os.getenv("SCHEMA_VECTOR_MAX_FILES", "64"))
+SCHEMA_VECTOR_DIM = 1024
+SCHEMA_RETRIEVER_MAX_ENTRIES = 16
+
+TRIGRAM_WEIGHT = 0.3        # char trigrams catch plurals / partial words
+TABLE_MIN_SCORE = 0.05      # cosine below which a candidate table is dropped
+COLUMN_MIN_SCORE = 0.15     # cosine for a column to go first when a table is cut
+MAX_COLUMNS_PER_TABLE = 12  # width of a cut table (only when over the token budget)
+FALLBACK_TABLES = 5         # tables retrieved when keyword trimming found none
+
+
+def _bucket(feature: str) -> int:
+    # stable across processes (unlike hash()), so saved vectors stay valid
+    return zlib.crc32(feature.encode()) % SCHEMA_VECTOR_DIM
+
+
+def _features(tokens):
+    features = {}
+    for token in tokens:
+        bucket = _bucket("w:" + token)
+        features[bucket] = features.get(bucket, 0.0) + 1.0
+
+        padded = f"#{token}#"
+        for i in range(len(padded) - 2):
+            bucket = _bucket("g:" + padded[i:i + 3])
+            features[bucket] = features.get(bucket, 0.0) + TRIGRAM_WEIGHT
+    return features
+
+
+def _dense(features) -> np.ndarray:
+    vec = np.zeros(SCHEMA_VECTOR_DIM, dtype=np.float32)
+    for bucket, weight in features.items():
+        vec[bucket] += weight
+    return vec
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def table_tokens(table: str, columns) -> list:
+    tokens = split_identifier(table)
+    for col in columns:
+        tokens.extend(split_identifier(col))
+    return tokens
+
+
+class SchemaRetriever:
+    """
+    Hashed TF-IDF vectors over table descriptions (table name + column
+    names), searched with NumPy cosine similarity. Column vectors are built
+    lazily for the tables a question touches.
+    """
+
+    def __init__(self, full_schema: dict, tables: list, matrix: np.ndarray, idf: np.ndarray):
+        self.schema = full_schema
+        self.tables = tables
+        self.table_rows = {t: i for i, t in enumerate(tables)}
+        self.matrix = matrix
+        self.idf = idf
+        self._column_vectors = {}
+
+    @classmethod
+    def build(cls, full_schema: dict):
+        tables = list(full_schema["tables"])
+        tf = np.zeros((len(tables), SCHEMA_VECTOR_DIM), dtype=np.float32)
+        for i, table in enumerate(tables):
+            tf[i] = _dense(_features(table_tokens(table, full_schema["tables"][table])))
+
+        df = np.count_nonzero(tf, axis=0)
+        idf = np.log((1 + len(tables)) / (1 + df)).astype(np.float32) + 1.0
+
+        return cls(full_schema, tables, _normalize(tf * idf), idf)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez(
+            path,
+            matrix=self.matrix,
+            idf=self.idf,
+            tables=np.array(json.dumps(self.tables))
+        )
+
+    @classmethod
+    def load(cls, path: str, full_schema: dict):
+        with np.load(path) as data:
+            tables = json.loads(str(data["tables"]))
+            if tables != list(full_schema["tables"]):
+                return None
+            return cls(full_schema, tables, data["matrix"], data["idf"])
+
+    def question_vector(self, question: str) -> np.ndarray:
+        tokens = []
+        for word in extract_keywords(question):
+            tokens.extend(split_identifier(word))
+        return _normalize(_dense(_features(tokens)) * self.idf)
+
+    def table_scores(self, qvec: np.ndarray) -> np.ndarray:
+        return self.matrix @ qvec
+
+    def column_scores(self, table: str, qvec: np.ndarray) -> np.ndarray:
+        vectors = self._column_vectors.get(table)
+        if vectors is None:
+            columns = self.schema["tables"][table]
+            vectors = np.stack([
+                _dense(_features(split_identifier(col))) for col in columns
+            ]) if columns else np.zeros((0, SCHEMA_VECTOR_DIM), dtype=np.float32)
+            vectors = _normalize(vectors * self.idf)
+            self._column_vectors[table] = vectors
+        return vectors @ qvec
+
+    def retrieve(self, trimmed_schema: dict, question: str, token_budget: int = SCHEMA_TOKEN_BUDGET) -> dict:
+        """
+        Pruned schema dict (same shape as trim_schema_for_prompt): the
+        candidate tables ranked by similarity to the question, unrelated ones
+        dropped (unless they join two kept tables), with their full column
+        lists. Only when that exceeds `token_budget` are wide tables cut to
+        their relevant, join and leading columns.
+        Serialize it with schema_serializer.serialize_schema for prompts.
+        """
+        qvec = self.question_vector(question)
+        table_scores = self.table_scores(qvec)
+
+        candidates = [t for t in trimmed_schema["tables"] if t in self.table_rows]
+        if not candidates:
+            top = np.argsort(-table_scores)[:FALLBACK_TABLES]
+            candidates = [self.tables[i] for i in top if table_scores[i] > 0]
+
+        # stable sort: ties keep the trimmer's order
+        score = {t: float(table_scores[self.table_rows[t]]) for t in candidates}
+        candidates.sort(key=lambda t: -score[t])
+
+        kept = [t for t in candidates if score[t] >= TABLE_MIN_SCORE] or candidates
+        kept_set = set(kept)
+        for table in candidates:
+            if table not in kept_set and len(self._joined_tables(table, kept_set)) >= 2:
+                kept.append(table)
+        kept_set = set(kept)
+
+        foreign_keys = [
+            fk for fk in self.schema["foreign_keys"]
+            if fk["source_table"] in kept_set
+            and fk["target_table"] in kept_set
+        ]
+        tables = {t: list(self.schema["tables"][t]) for t in kept if self.schema["tables"][t]}
+        pruned = {"tables": tables, "foreign_keys": foreign_keys}
+
+        if serialize_schema(pruned, token_budget=None)[1] <= token_budget:
+            return pruned
+
+        join_columns = {}
+        for fk in foreign_keys:
+            join_columns.setdefault(fk["source_table"], set()).add(fk["source_column"])
+            join_columns.setdefault(fk["target_table"], set()).add(fk["target_column"])
+
+        for table, columns in tables.items():
+            if len(columns) > MAX_COLUMNS_PER_TABLE:
+                tables[table] = self._cut_columns(table, columns, join_columns.get(table, set()), qvec)
+        return pruned
+
+    def _joined_tables(self, table: str, others: set) -> set:
+        joined = set()
+        for fk in self.schema["foreign_keys"]:
+            if fk["source_table"] == table and fk["target_table"] in others:
+                joined.add(fk["target_table"])
+            elif fk["target_table"] == table and fk["source_table"] in others:
+                joined.add(fk["source_table"])
+        return joined
+
+    def _cut_columns(self, table: str, columns: list, join_columns: set, qvec: np.ndarray) -> list:
+        # relevant columns first, then the leading ones (names, dates, ...)
+        scores = self.column_scores(table, qvec)
+        keep = {columns[0]} | join_columns
+        ranked = [columns[i] for i in np.argsort(-scores) if scores[i] >= COLUMN_MIN_SCORE]
+        for col in ranked + columns:
+            if len(keep) >= MAX_COLUMNS_PER_TABLE:
+                break
+            keep.add(col)
+        return [col for col in columns if col in keep]
+
+
+_retrievers = OrderedDict()
+_retriever_lock = threading.Lock()
+
+
+def _touch(path: str):
+    # the file's mtime is its last use for _prune_vector_files
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def _prune_vector_files(keep: str):
+    """
+    Caps SCHEMA_VECTOR_DIR at SCHEMA_VECTOR_MAX_FILES. Files are keyed by
+    schema content, so the one of a schema that changed (or of a removed
+    database) is never read again; the least recently used go first.
+    """
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.path)
+            for entry in os.scandir(SCHEMA_VECTOR_DIR)
+            if entry.name.endswith(".npz") and entry.path != keep
+        ]
+    except OSError as e:
+        logger.warning("schema vector cleanup failed: %r", e)
+        return
+
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) + 1 - SCHEMA_VECTOR_MAX_FILES)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("schema vector cleanup failed: %r", e)
+
+
+def get_schema_retriever(cache_key: str, full_schema: dict) -> SchemaRetriever:
+    """
+    One retriever per schema fingerprint: in memory first, then the vector
+    file under SCHEMA_VECTOR_DIR, built and saved only when neither exists
+    (saving evicts the least recently used files over the cap).
+    """
+    with _retriever_lock:
+        cached = _retrievers.get(cache_key)
+        if cached is not None and cached.schema is full_schema:
+            _retrievers.move_to_end(cache_key)
+            return cached
+
+    path = os.path.join(SCHEMA_VECTOR_DIR, f"{schema_content_key(full_schema)}.npz")
+    retriever = None
+    if os.path.exists(path):
+        try:
+            retriever = SchemaRetriever.load(path, full_schema)
+            if retriever is not None:
+                _touch(path)
+        except Exception as e:
+            logger.warning("schema vector load failed: %r", e)
+
+    if retriever is None:
+        retriever = SchemaRetriever.build(full_schema)
+        try:
+            retriever.save(path)
+        except OSError as e:
+            logger.warning("schema vector save failed: %r", e)
+        else:
+            _prune_vector_files(path)
+
+    with _retriever_lock:
+        _retrievers[cache_key] = retriever
+        _retrievers.move_to_end(cache_key)
+        while len(_retrievers) > SCHEMA_RETRIEVER_MAX_ENTRIES:
+            _retrievers.popitem(last=False)
+
+    return retriever
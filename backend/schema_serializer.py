@@ -0,0 +1,130 @@
+import os
+import re
+
+
+# Prompt budget for the schema block; local models run with num_ctx 4096
+SCHEMA_TOKEN_BUDGET = int(os.getenv("SCHEMA_TOKEN_BUDGET", "1500"))
+CHARS_PER_TOKEN = 4
+
+FORMAT_HEADER = "# table(column, fk_column→table.column)"
+
+# longest prefixes first so NVARCHAR / BIGINT / DATETIME win over VARCHAR / INT / DATE
+TYPE_ABBREVIATIONS = [
+    ("NVARCHAR", "str"), ("VARCHAR", "str"), ("NCHAR", "str"), ("CHAR", "str"),
+    ("NTEXT", "text"), ("TEXT", "text"), ("UUID", "uuid"), ("UNIQUEIDENTIFIER", "uuid"),
+    ("BIGINT", "int"), ("SMALLINT", "int"), ("TINYINT", "int"), ("INTEGER", "int"),
+    ("INT", "int"), ("DECIMAL", "dec"), ("NUMERIC", "dec"), ("MONEY", "dec"),
+    ("DOUBLE", "float"), ("FLOAT", "float"), ("REAL", "float"),
+    ("DATETIME", "ts"), ("TIMESTAMP", "ts"), ("DATE", "date"), ("TIME", "time"),
+    ("BOOLEAN", "bool"), ("BIT", "bool"), ("JSON", "json"), ("BLOB", "bytes"),
+    ("VARBINARY", "bytes"), ("BINARY", "bytes"),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate (~4 characters per token), good enough for budgeting.
+    """
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def abbreviate_type(type_name) -> str:
+    upper = re.sub(r"\(.*\)", "", str(type_name)).strip().upper()
+    for prefix, short in TYPE_ABBREVIATIONS:
+        if upper.startswith(prefix):
+            return short
+    return upper.lower()
+
+
+def _column_labels(table, columns, fk_targets, column_types, abbreviate_types):
+    types = (column_types or {}).get(table, {})
+    labels = []
+    for col in columns:
+        label = col
+        type_name = types.get(col)
+        if type_name is not None:
+            label += f" {abbreviate_type(type_name) if abbreviate_types else type_name}"
+        target = fk_targets.get((table, col))
+        if target:
+            label += f"→{target}"
+        labels.append(label)
+    return labels
+
+
+def _partial_line(table, columns, labels, fk_targets, token_budget):
+    """
+    Largest "table(col, ..., …)" that fits: first column and FK columns first,
+    then the rest in schema order.
+    """
+    priority = [0] + [
+        i for i, col in enumerate(columns)
+        if i and (table, col) in fk_targets
+    ]
+    priority += [i for i in range(len(columns)) if i not in priority]
+
+    kept = []
+    best = None
+    for i in priority:
+        candidate = sorted(kept + [i])
+        line = f"{table}({', '.join(labels[j] for j in candidate)}, …)"
+        if estimate_tokens(line) + 1 > token_budget:
+            break
+        kept, best = candidate, line
+    return best
+
+
+def serialize_schema(
+    schema: dict,
+    token_budget: int | None = SCHEMA_TOKEN_BUDGET,
+    column_types: dict | None = None,
+    abbreviate_types: bool = True,
+):
+    """
+    Compact DDL-like schema text for prompts:
+
+        orders(id, customer_id→customers.id, total, created_at)
+
+    Tables are taken in the given (relevance) order and added greedily until
+    `token_budget` is reached; a table that doesn't fit whole keeps its first
+    and FK columns. `column_types` ({table: {column: type}}) adds types.
+
+    Returns (text, estimated_tokens).
+    """
+    fk_targets = {
+        (fk["source_table"], fk["source_column"]):
+            f"{fk['target_table']}.{fk['target_column']}"
+        for fk in schema.get("foreign_keys", [])
+    }
+
+    lines = [FORMAT_HEADER]
+    used = estimate_tokens(FORMAT_HEADER) + 1
+    # room for the "tables omitted" note
+    reserve = 10 if token_budget else 0
+    omitted = 0
+
+    for table, columns in schema["tables"].items():
+        labels = _column_labels(table, columns, fk_targets, column_types, abbreviate_types)
+        line = f"{table}({', '.join(labels)})"
+        cost = estimate_tokens(line) + 1
+
+        if not token_budget or used + cost <= token_budget - reserve:
+            lines.append(line)
+            used += cost
+            continue
+
+        line = _partial_line(
+            table, columns, labels, fk_targets, token_budget - reserve - used
+        ) if columns else None
+        if line is None:
+            omitted += 1
+            continue
+
+        lines.append(line)
+        used += estimate_tokens(line) + 1
+
+    if omitted:
+        note = f"# {omitted} more tables omitted"
+        lines.append(note)
+        used += estimate_tokens(note) + 1
+
+    return "\n".join(lines), used
@@ -1,5 +1,18 @@
+import math
 import re
-from collections import defaultdict
+import threading
+from collections import OrderedDict, defaultdict, deque
+
+
+SCHEMA_INDEX_MAX_ENTRIES = 64
+NGRAM = 3
+
+# relevance scoring weights
+TABLE_HIT_WEIGHT = 3.0      # keyword found in the table name
+COLUMN_HIT_WEIGHT = 1.0     # keyword found in one of its columns
+TOKEN_HIT_BONUS = 0.5       # keyword is a whole identifier token, not just a substring
+HOP_DECAY = 0.5             # score multiplier per FK hop from a matched table
+MAX_JOIN_PATH_HOPS = 3      # longest FK path used to connect two matched tables
 
 
 def extract_keywords(text: str):
@@ -16,49 +29,316 @@ def extract_keywords(text: str):
     return {w for w in words if w not in stopwords and len(w) > 2}
 
 
-def trim_schema_for_prompt(full_schema: dict, user_question: str, max_tables: int = 15):
+def split_identifier(name: str):
     """
-    Returns a trimmed schema dict safe to send to LLM
+    Splits schema / snake / camel / Pascal case names into lowercase tokens:
+    "Sales.SalesOrderHeader" -> ["sales", "sales", "order", "header"]
     """
+    tokens = []
+    for part in re.split(r"[^A-Za-z0-9]+", name):
+        tokens.extend(
+            t.lower() for t in
+            re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+", part)
+        )
+    return tokens
 
-    keywords = extract_keywords(user_question)
 
-    tables = full_schema["tables"]
-    foreign_keys = full_schema["foreign_keys"]
+def _ngrams(text: str):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class SchemaIndex:
+    """
+    Inverted index over a schema dict, built once per cached schema.
+
+    - n-gram postings over lowercase table / column names answer the trimmer's
+      substring test ("keyword in name") by touching only candidate names
+    - identifier tokens (snake / camel / Pascal split) map to tables and columns
+    - FK adjacency map (neighbours pre-sorted by name) replaces the linear
+      pass over all foreign keys
+    """
+
+    def __init__(self, full_schema: dict):
+        self.schema = full_schema
+
+        self.names = []                       # distinct lowercase names
+        self.name_tables = []                 # name id -> tables named so
+        self.name_column_tables = []          # name id -> tables with a column named so
+        self.ngram_postings = defaultdict(set)
+        self.token_tables = defaultdict(set)          # token -> tables (table-name hits)
+        self.token_column_tables = defaultdict(set)   # token -> tables (column hits)
+        self.outgoing_fks = defaultdict(list)
+
+        name_ids = {}
+
+        def add_name(name_lc: str) -> int:
+            name_id = name_ids.get(name_lc)
+            if name_id is None:
+                name_id = name_ids[name_lc] = len(self.names)
+                self.names.append(name_lc)
+                self.name_tables.append(set())
+                self.name_column_tables.append(set())
+                for gram in _ngrams(name_lc):
+                    self.ngram_postings[gram].add(name_id)
+            return name_id
+
+        for table, columns in full_schema["tables"].items():
+            self.name_tables[add_name(table.lower())].add(table)
+            for token in split_identifier(table):
+                self.token_tables[token].add(table)
+
+            for col in columns:
+                self.name_column_tables[add_name(col.lower())].add(table)
+                for token in split_identifier(col):
+                    self.token_column_tables[token].add(table)
+
+        adjacency = defaultdict(set)
+        for fk in full_schema["foreign_keys"]:
+            adjacency[fk["source_table"]].add(fk["target_table"])
+            adjacency[fk["target_table"]].add(fk["source_table"])
+            self.outgoing_fks[fk["source_table"]].append(fk)
+        # sorted once, so every traversal breaks ties by name for free
+        self.adjacency = {table: tuple(sorted(n)) for table, n in adjacency.items()}
+
+    def names_containing(self, keyword: str):
+        """
+        Name ids whose text contains `keyword` (same result as a full scan).
+        """
+        keyword = keyword.lower()
+
+        if len(keyword) < NGRAM:
+            return [i for i, name in enumerate(self.names) if keyword in name]
+
+        postings = sorted(
+            (self.ngram_postings.get(gram, set()) for gram in _ngrams(keyword)),
+            key=len
+        )
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return []
+
+        return [i for i in candidates if keyword in self.names[i]]
+
+    def score_tables(self, keywords):
+        """
+        Keyword relevance per table: table-name hits outweigh column hits,
+        whole-token hits get a bonus, and every hit is weighted by an
+        IDF-style rarity of the keyword across tables.
+        """
+        n_tables = max(len(self.schema["tables"]), 1)
+        scores = defaultdict(float)
+
+        for keyword in keywords:
+            table_hits = set()
+            column_hits = set()
+            for name_id in self.names_containing(keyword):
+                table_hits |= self.name_tables[name_id]
+                column_hits |= self.name_column_tables[name_id]
+
+            hit_tables = table_hits | column_hits
+            if not hit_tables:
+                continue
+
+            idf = math.log(1 + n_tables / len(hit_tables))
+            token_tables = self.token_tables.get(keyword, set())
+            token_column_tables = self.token_column_tables.get(keyword, set())
+
+            for table in hit_tables:
+                if table in table_hits:
+                    weight = TABLE_HIT_WEIGHT
+                    if table in token_tables:
+                        weight += TOKEN_HIT_BONUS
+                else:
+                    weight = COLUMN_HIT_WEIGHT
+                    if table in token_column_tables:
+                        weight += TOKEN_HIT_BONUS
+                scores[table] += weight * idf
+
+        return dict(scores)
+
+    def neighbours(self, table: str):
+        return self.adjacency.get(table, ())
+
+
+class JoinTree:
+    """
+    Multi-source BFS over the FK graph from the selected tables, grown
+    incrementally: adding tables only revisits the tables they bring
+    closer, instead of one BFS per candidate.
+    """
+
+    def __init__(self, index: SchemaIndex, max_hops: int):
+        self.index = index
+        self.max_hops = max_hops
+        self.depth = {}      # table -> FK hops to the nearest selected table
+        self.parent = {}     # table -> previous table on that path (None if selected)
+
+    def add(self, tables):
+        queue = deque()
+        for table in tables:
+            self.depth[table] = 0
+            self.parent[table] = None
+            queue.append(table)
+
+        while queue:
+            table = queue.popleft()
+            depth = self.depth[table] + 1
+            if depth > self.max_hops:
+                continue
+            for neighbour in self.index.neighbours(table):
+                if self.depth.get(neighbour, depth + 1) <= depth:
+                    continue
+                self.depth[neighbour] = depth
+                self.parent[neighbour] = table
+                queue.append(neighbour)
+
+    def path_to(self, target: str):
+        """
+        Tables joining `target` to the selection (excluding the selected
+        end, ending with `target`), or None if it is more than max_hops away.
+        """
+        if target not in self.depth:
+            return None
+        path = []
+        table = target
+        while self.parent[table] is not None:
+            path.append(table)
+            table = self.parent[table]
+        return path[::-1]
+
+
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
 
-    matched_tables = set()
+def get_schema_index(cache_key: str, full_schema: dict) -> SchemaIndex:
+    """
+    Returns the index for `full_schema`, rebuilding it only when the schema
+    cache handed out a different schema object for this key.
+    """
+    with _index_lock:
+        index = _index_cache.get(cache_key)
+        if index is not None and index.schema is full_schema:
+            _index_cache.move_to_end(cache_key)
+            return index
+
+    index = SchemaIndex(full_schema)
+
+    with _index_lock:
+        _index_cache[cache_key] = index
+        _index_cache.move_to_end(cache_key)
+        while len(_index_cache) > SCHEMA_INDEX_MAX_ENTRIES:
+            _index_cache.popitem(last=False)
 
-    # 1️⃣ Keyword → table / column matching
-    for table, columns in tables.items():
-        table_lc = table.lower()
+    return index
 
-        if any(k in table_lc for k in keywords):
-            matched_tables.add(table)
+
+def rank_tables(index: SchemaIndex, keywords, max_tables: int, max_hops: int = 2):
+    """
+    Deterministic, relevance-ordered table selection:
+
+    1. matched tables ordered by keyword score (ties by name)
+    2. each next matched table is joined to the tables already selected via
+       its shortest FK path (greedy Steiner tree), so join tables are kept
+    3. matched tables whose join path did not fit follow by score
+    4. remaining slots go to FK neighbours up to `max_hops` away, scored by
+       their best matched neighbour decayed per hop
+    """
+    scores = index.score_tables(keywords)
+    if not scores:
+        return []
+
+    seeds = sorted(scores, key=lambda t: (-scores[t], t))
+    selected = []
+    chosen = set()
+    join_tree = JoinTree(index, MAX_JOIN_PATH_HOPS)
+
+    def take(tables):
+        added = [t for t in tables if t not in chosen]
+        chosen.update(added)
+        selected.extend(added)
+        return added
+
+    # only the strongest matches are worth a join-path search
+    for seed in seeds[:2 * max_tables]:
+        if len(selected) >= max_tables:
+            break
+        if seed in chosen:
+            continue
+        if not selected:
+            join_tree.add(take([seed]))
             continue
 
-        for col in columns:
-            if any(k in col.lower() for k in keywords):
-                matched_tables.add(table)
-                break
+        path = join_tree.path_to(seed)
+        if path is not None and len(chosen) + len(path) <= max_tables:
+            join_tree.add(take(path))
+        elif path is None:
+            # not connected to what we have, still relevant on its own
+            join_tree.add(take([seed]))
+
+    # seeds skipped because their join path did not fit come before expansion
+    for seed in seeds:
+        if len(selected) >= max_tables:
+            return selected
+        take([seed])
+
+    # multi-hop expansion around matched tables
+    expansion = {}
+    frontier = {t: scores[t] for t in seeds}
+    for _ in range(max_hops):
+        next_frontier = {}
+        for table, score in frontier.items():
+            for neighbour in index.neighbours(table):
+                decayed = score * HOP_DECAY
+                if neighbour in scores or decayed <= expansion.get(neighbour, 0):
+                    continue
+                expansion[neighbour] = decayed
+                next_frontier[neighbour] = decayed
+        frontier = next_frontier
+
+    for table in sorted(expansion, key=lambda t: (-expansion[t], t)):
+        if len(selected) >= max_tables:
+            break
+        take([table])
+
+    return selected[:max_tables]
 
-    # 2️⃣ FK expansion
-    expanded_tables = set(matched_tables)
 
-    for fk in foreign_keys:
-        if fk["source_table"] in matched_tables:
-            expanded_tables.add(fk["target_table"])
-        if fk["target_table"] in matched_tables:
-            expanded_tables.add(fk["source_table"])
+def trim_schema_for_prompt(
+    full_schema: dict,
+    user_question: str,
+    max_tables: int = 15,
+    index: SchemaIndex | None = None,
+    max_hops: int = 2
+):
+    """
+    Returns a trimmed schema dict safe to send to LLM, tables ordered by
+    relevance (see rank_tables). Pass the cached index from
+    get_schema_index; without one it is built for this call.
+    """
+
+    keywords = extract_keywords(user_question)
+
+    if index is None:
+        index = SchemaIndex(full_schema)
+
+    tables = full_schema["tables"]
 
-    # 3️⃣ Hard cap (token safety)
-    final_tables = list(expanded_tables)[:max_tables]
+    # FK targets can name tables that were not introspected
+    final_tables = [
+        t for t in rank_tables(index, keywords, max_tables, max_hops)
+        if t in tables
+    ]
+    final_set = set(final_tables)
 
     trimmed_schema = {
         "tables": {t: tables[t] for t in final_tables},
         "foreign_keys": [
-            fk for fk in foreign_keys
-            if fk["source_table"] in final_tables
-            and fk["target_table"] in final_tables
+            fk for table in final_tables
+            for fk in index.outgoing_fks.get(table, ())
+            if fk["target_table"] in final_set
         ]
     }
 
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from schema_cache import on_schema_change
+
+
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "1") == "1"
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "2048"))
+# Jaccard similarity over token shingles; 0 disables near-duplicate lookup
+SQL_CACHE_NEAR_DUP_THRESHOLD = float(os.getenv("SQL_CACHE_NEAR_DUP_THRESHOLD", "0"))
+
+STOPWORDS = {
+    "the", "a", "an", "is", "are", "of", "in", "on", "for", "to", "by",
+    "me", "please", "show", "list", "give", "get", "find", "what", "which"
+}
+
+
+def normalize_question(question: str) -> str:
+    question = question.lower()
+    question = re.sub(r"[^\w\s]", " ", question)
+    return " ".join(question.split())
+
+
+def question_shingles(normalized: str) -> frozenset:
+    """
+    Unigrams + bigrams of the content words, order-insensitive enough that
+    "sales by region last month" ~ "last month sales by region".
+    """
+    tokens = [t for t in normalized.split() if t not in STOPWORDS]
+    bigrams = {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+    return frozenset(tokens) | frozenset(bigrams)
+
+
+def schema_content_key(schema: dict) -> str:
+    """
+    Content hash of a schema dict, e.g. the trimmed schema a question's SQL
+    was generated from (not schema_cache.schema_fingerprint, which checks
+    the live catalog).
+    """
+    payload = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _numbers(normalized: str) -> frozenset:
+    return frozenset(re.findall(r"\d+", normalized))
+
+
+def _jaccard(a: frozenset, b: frozenset) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class SQLCache:
+    """
+    Maps (database, dialect, trimmed-schema fingerprint, normalized question)
+    to SQL that validated and executed successfully.
+
+    A hit lets chat_message skip both prune_schema and generate_sql.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = SQL_CACHE_MAX_ENTRIES,
+        near_dup_threshold: float = SQL_CACHE_NEAR_DUP_THRESHOLD,
+    ):
+        self.max_entries = max_entries
+        self.near_dup_threshold = near_dup_threshold
+        self._entries = OrderedDict()   # key -> {"sql", "shingles", "numbers"}
+        self._scopes = {}               # (db_key, dialect, schema_fp) -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, db_key: str, dialect: str, schema_fp: str, question: str):
+        normalized = normalize_question(question)
+        scope = (db_key, dialect, schema_fp)
+        key = scope + (normalized,)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["sql"]
+
+            if self.near_dup_threshold > 0:
+                entry = self._near_duplicate(scope, normalized)
+                if entry is not None:
+                    self.near_hits += 1
+                    return entry["sql"]
+
+            self.misses += 1
+            return None
+
+    def put(self, db_key: str, dialect: str, schema_fp: str, question: str, sql: str):
+        normalized = normalize_question(question)
+        scope = (db_key, dialect, schema_fp)
+        key = scope + (normalized,)
+
+        with self._lock:
+            self._entries[key] = {
+                "sql": sql,
+                "shingles": question_shingles(normalized),
+                "numbers": _numbers(normalized),
+            }
+            self._entries.move_to_end(key)
+            self._scopes.setdefault(scope, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                old_key, _ = self._entries.popitem(last=False)
+                self._discard_scope_key(old_key)
+
+    def discard(self, db_key: str, dialect: str, schema_fp: str, question: str):
+        key = (db_key, dialect, schema_fp, normalize_question(question))
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._discard_scope_key(key)
+
+    def invalidate_db(self, db_key: str):
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == db_key]
+            for key in stale:
+                del self._entries[key]
+                self._discard_scope_key(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": (
+                    (self.hits + self.near_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+    def _near_duplicate(self, scope, normalized: str):
+        shingles = question_shingles(normalized)
+        numbers = _numbers(normalized)
+        best, best_score = None, self.near_dup_threshold
+
+        for key in self._scopes.get(scope, ()):
+            entry = self._entries[key]
+            # "top 5" and "top 10" must never share SQL
+            if entry["numbers"] != numbers:
+                continue
+            score = _jaccard(shingles, entry["shingles"])
+            if score >= best_score:
+                best, best_score = entry, score
+
+        return best
+
+    def _discard_scope_key(self, key):
+        scope = key[:3]
+        keys = self._scopes.get(scope)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del self._scopes[scope]
+
+
+sql_cache = SQLCache()
+
+# cached SQL is only valid for the schema it was generated against
+on_schema_change(sql_cache.invalidate_db)
@@ -1,60 +1,65 @@
-import sqlglot
 from sqlglot import exp
 
+# dialect map and parsing live in sql_parse_cache; re-exported for callers
+from sql_parse_cache import SQLGLOT_DIALECTS, sqlglot_dialect, parse_sql, tables_and_columns
 
-def extract_sql_metadata(sql: str, dialect: str):
+
+def canonicalize_sql(sql: str, dialect: str, parsed=None) -> str:
     """
-    Returns:
-    {
-      "tables": ["Sales.Customer", "Sales.SalesOrderHeader"],
-      "columns": ["Sales.Customer.CustomerID", "Sales.SalesOrderHeader.TotalDue"]
-    }
+    Formatting-independent form of a query (whitespace, keyword case,
+    comments), used as a cache key. Falls back to whitespace collapsing.
+    Pass `parsed` (the ParsedSQL from validate_sql) to skip re-parsing.
     """
+    try:
+        if parsed is None:
+            parsed = parse_sql(sql, dialect)
+        return parsed.canonical
+    except Exception:
+        return " ".join(sql.split())
 
-    dialect_map = {
-        "mssql": "tsql",
-        "postgresql": "postgres",
-        "mysql": "mysql",
-        "sqlite": "sqlite",
-    }
-
-    read_dialect = dialect_map.get(dialect, None)
 
-    parsed = sqlglot.parse_one(sql, read=read_dialect)
+def _with_key(expression) -> str:
+    # sqlglot renamed the CTE arg from "with" to "with_"
+    return "with_" if "with_" in expression.arg_types else "with"
 
-    tables = {}
-    alias_map = {}
 
-    # ---- 1. Extract tables + aliases ----
-    for table in parsed.find_all(exp.Table):
-        schema = table.db
-        name = table.name
-        alias = table.alias
+def build_count_sql(sql: str, dialect: str) -> str:
+    """
+    SELECT COUNT(*) over the query, valid for the target dialect:
+    CTEs are hoisted to the outer query and ORDER BY without a limit is
+    dropped (T-SQL rejects it inside a derived table).
+    """
+    read_dialect = sqlglot_dialect(dialect)
+    # a copy of the cached tree, ours to modify
+    inner = parse_sql(sql, dialect).expression
 
-        full_name = f"{schema}.{name}" if schema else name
+    with_key = _with_key(inner)
+    ctes = inner.args.get(with_key)
+    inner.set(with_key, None)
 
-        tables[full_name] = True
+    if not inner.args.get("limit") and not inner.args.get("offset"):
+        inner.set("order", None)
 
-        if alias:
-            alias_map[alias] = full_name
-        else:
-            alias_map[name] = full_name
+    outer = exp.select(exp.Count(this=exp.Star())).from_(inner.subquery("q"))
+    if ctes is not None:
+        outer.set(with_key, ctes)
 
-    # ---- 2. Extract columns ----
-    columns = set()
+    return outer.sql(dialect=read_dialect)
 
-    for col in parsed.find_all(exp.Column):
-        col_name = col.name
-        table_alias = col.table
 
-        if table_alias and table_alias in alias_map:
-            full_table = alias_map[table_alias]
-            columns.add(f"{full_table}.{col_name}")
-        else:
-            # fallback (rare but safe)
-            columns.add(col_name)
+def extract_sql_metadata(sql: str, dialect: str, parsed=None):
+    """
+    `parsed` (the ParsedSQL from validate_sql) is used instead of parsing
+    `sql` again; its metadata is computed once per parse.
 
-    return {
-        "tables": sorted(tables.keys()),
-        "columns": sorted(columns),
+    Returns:
+    {
+      "tables": ["Sales.Customer", "Sales.SalesOrderHeader"],
+      "columns": ["Sales.Customer.CustomerID", "Sales.SalesOrderHeader.TotalDue"]
     }
+    """
+
+    if parsed is None:
+        parsed = parse_sql(sql, dialect)
+
+    return {"tables": parsed.tables, "columns": parsed.columns}
@@ -0,0 +1,250 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import cached_property
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import ParseError, SqlglotError
+
+from telemetry import cache_events
+
+
+SQL_PARSE_CACHE_MAX_ENTRIES = int(os.getenv("SQL_PARSE_CACHE_MAX_ENTRIES", "1024"))
+
+# SQLAlchemy dialect name -> sqlglot dialect
+SQLGLOT_DIALECTS = {
+    "mssql": "tsql",
+    "postgresql": "postgres",
+    "mysql": "mysql",
+    "sqlite": "sqlite",
+}
+
+# Nodes that write, change schema / permissions or escape to raw commands,
+# wherever they appear in the tree (e.g. a DELETE inside a CTE)
+FORBIDDEN_NODES = (
+    exp.Insert, exp.Update, exp.Delete, exp.Merge,
+    exp.Create, exp.Drop, exp.Alter, exp.TruncateTable,
+    exp.Pragma, exp.Attach, exp.Detach, exp.Grant, exp.Revoke,
+    exp.Command, exp.Execute, exp.Copy, exp.LoadData, exp.Kill,
+    exp.Set, exp.Use, exp.Transaction, exp.Commit,
+    exp.Into,   # SELECT ... INTO new_table
+    exp.Lock,   # SELECT ... FOR UPDATE
+)
+
+
+def sqlglot_dialect(dialect: str):
+    return SQLGLOT_DIALECTS.get(dialect, None)
+
+
+class ParsedSQL:
+    """
+    One parse of (dialect, sql) plus facts derived from it, computed once.
+
+    The parsed tree is shared by every caller of the cache, so it is never
+    handed out: `expression` returns a private copy, and the facts callers
+    need (read-only check, outer limit, metadata, canonical text, limited
+    SQL) are computed here from the shared tree without modifying it.
+    """
+
+    def __init__(self, sql: str, read_dialect, statements: tuple, error: str | None):
+        self.sql = sql
+        self.read_dialect = read_dialect
+        self.statements = statements
+        self.error = error
+
+    @property
+    def _statement(self) -> exp.Expression:
+        # shared tree: read it, never modify it
+        if self.error is not None:
+            raise ParseError(self.error)
+        if not self.statements:
+            raise ParseError("No SQL statement found")
+        return self.statements[0]
+
+    @property
+    def expression(self) -> exp.Expression:
+        """
+        A copy of the first statement, free to modify; raises ParseError if
+        the SQL did not parse.
+        """
+        return self._statement.copy()
+
+    @cached_property
+    def read_only_error(self) -> str | None:
+        """
+        Why the SQL is not a single read-only query, or None if it is.
+        """
+        if self.error is not None:
+            return f"Could not parse SQL: {self.error}"
+        if len(self.statements) != 1:
+            return "Only a single SQL statement is allowed"
+
+        parsed = self.statements[0]
+        if not isinstance(parsed, exp.Query):
+            return "Only read-only queries are allowed"
+
+        for node in parsed.walk():
+            if isinstance(node, FORBIDDEN_NODES):
+                return f"Forbidden operation: {node.key}"
+        return None
+
+    @property
+    def is_read_only(self) -> bool:
+        return self.read_only_error is None
+
+    @cached_property
+    def takes_row_limit(self) -> bool:
+        """
+        True when an outer row limit can be injected: a query reading rows
+        (not a constant SELECT or an aggregate) without a LIMIT / TOP /
+        FETCH FIRST of its own.
+        """
+        parsed = self._statement
+        if not isinstance(parsed, exp.Query):
+            return False
+
+        if isinstance(parsed, exp.Select):
+            # constant selects (SELECT 'NOT_ANSWERABLE') return one row anyway
+            if not (parsed.args.get("from_") or parsed.args.get("from")):
+                return False
+            if _is_aggregate_select(parsed):
+                return False
+
+        # LIMIT, TOP and FETCH FIRST all live in the "limit" arg
+        return parsed.args.get("limit") is None
+
+    def with_limit(self, max_rows: int) -> str:
+        """
+        The query with its outer row limit set to `max_rows`, in the
+        dialect's own form (LIMIT, TOP, FETCH FIRST).
+        """
+        parsed = self._statement
+        if not isinstance(parsed, exp.Query):
+            raise ValueError("Only queries can be limited")
+        # .limit() builds on a copy
+        return parsed.limit(max_rows).sql(dialect=self.read_dialect)
+
+    @cached_property
+    def canonical(self) -> str:
+        """
+        Formatting-independent text (whitespace, keyword case, comments).
+        """
+        return self._statement.sql(dialect=self.read_dialect, comments=False)
+
+    @cached_property
+    def metadata(self) -> dict:
+        return tables_and_columns(self._statement)
+
+    @property
+    def tables(self) -> list:
+        return list(self.metadata["tables"])
+
+    @property
+    def columns(self) -> list:
+        return list(self.metadata["columns"])
+
+
+def _is_aggregate_select(select: exp.Select) -> bool:
+    """
+    Outer query is an aggregate (GROUP BY, or aggregate functions that are
+    not window functions / inside subqueries).
+    """
+    if select.args.get("group"):
+        return True
+
+    for projection in select.expressions:
+        for agg in projection.find_all(exp.AggFunc):
+            if not agg.find_ancestor(exp.Window, exp.Subquery):
+                return True
+    return False
+
+
+def tables_and_columns(parsed: exp.Expression) -> dict:
+    tables = {}
+    alias_map = {}
+
+    # ---- 1. Extract tables + aliases ----
+    for table in parsed.find_all(exp.Table):
+        schema = table.db
+        name = table.name
+        alias = table.alias
+
+        full_name = f"{schema}.{name}" if schema else name
+
+        tables[full_name] = True
+
+        if alias:
+            alias_map[alias] = full_name
+        else:
+            alias_map[name] = full_name
+
+    # ---- 2. Extract columns ----
+    columns = set()
+
+    for col in parsed.find_all(exp.Column):
+        col_name = col.name
+        table_alias = col.table
+
+        if table_alias and table_alias in alias_map:
+            full_table = alias_map[table_alias]
+            columns.add(f"{full_table}.{col_name}")
+        else:
+            # fallback (rare but safe)
+            columns.add(col_name)
+
+    return {
+        "tables": sorted(tables.keys()),
+        "columns": sorted(columns),
+    }
+
+
+class SQLParseCache:
+    """
+    Bounded LRU of ParsedSQL keyed by (sqlglot dialect, exact SQL text).
+    Parse failures are cached too, so bad SQL is not re-parsed either.
+    """
+
+    def __init__(self, max_entries: int = SQL_PARSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, sql: str, dialect: str) -> ParsedSQL:
+        read_dialect = sqlglot_dialect(dialect)
+        key = (read_dialect, sql)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                cache_events.inc(cache="parse", result="hit")
+                return entry
+
+        # parse outside the lock; a concurrent duplicate parse is harmless
+        try:
+            statements = tuple(
+                s for s in sqlglot.parse(sql, read=read_dialect) if s is not None
+            )
+            entry = ParsedSQL(sql, read_dialect, statements, None)
+        except SqlglotError as e:
+            entry = ParsedSQL(sql, read_dialect, (), str(e))
+        cache_events.inc(cache="parse", result="miss")
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def __len__(self):
+        return len(self._entries)
+
+
+sql_parse_cache = SQLParseCache()
+
+
+def parse_sql(sql: str, dialect: str) -> ParsedSQL:
+    return sql_parse_cache.get(sql, dialect)
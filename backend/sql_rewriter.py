@@ -0,0 +1,52 @@
+import os
+
+from sql_parse_cache import parse_sql
+
+
+# Rewrite generated SQL so the database itself stops after the fetch budget
+QUERY_AUTO_LIMIT = os.getenv("QUERY_AUTO_LIMIT", "1") == "1"
+
+
+def apply_row_limit(sql: str, dialect: str, max_rows: int, parsed=None) -> str:
+    """
+    Injects an outer row limit in the dialect's own form (LIMIT, TOP,
+    FETCH FIRST) when the query has none. Aggregates and queries that
+    already limit themselves are left alone; the fetch budget still caps
+    how many rows are read from those. Returns the SQL unchanged when
+    nothing needs rewriting or it can't be parsed. `parsed` is the
+    ParsedSQL of `sql` (e.g. from validate_sql); its cached facts are used
+    instead of re-parsing.
+    """
+    if parsed is None:
+        parsed = parse_sql(sql, dialect)
+
+    try:
+        if not parsed.takes_row_limit:
+            return sql
+        return parsed.with_limit(max_rows)
+    except Exception:
+        return sql
+
+
+# dialects whose EXPLAIN plans a query without running it
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+}
+
+
+def dry_run_sql(sql: str, dialect: str) -> str:
+    """
+    A cheap probe that makes the database resolve tables / columns without
+    producing rows: EXPLAIN where it does not execute, otherwise the query
+    with a zero row limit (TOP 0 / LIMIT 0 / FETCH FIRST 0).
+    """
+    prefix = EXPLAIN_PREFIXES.get(dialect)
+    if prefix is not None:
+        return prefix + sql
+
+    try:
+        return parse_sql(sql, dialect).with_limit(0)
+    except Exception:
+        return sql
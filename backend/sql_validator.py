@@ -1,19 +1,20 @@
-import re
+from sql_parse_cache import ParsedSQL, parse_sql
 
-FORBIDDEN = {
-    "insert", "update", "delete", "drop",
-    "alter", "truncate", "pragma", "attach",
-    "detach", "grant", "revoke"
-}
+def validate_sql(sql: str, dialect: str | None = None) -> ParsedSQL:
+    """
+    Parses `sql` once (shared parse cache) and walks the tree: exactly one
+    statement, a query (SELECT / WITH / set operation), and no write, DDL
+    or command node anywhere in it (see sql_parse_cache.FORBIDDEN_NODES).
+    Identifiers and string literals are never mistaken for keywords
+    (`updated_at`, 'delete me').
 
-def validate_sql(sql: str) -> None:
-    sql_l = sql.lower().strip()
+    Returns the cached ParsedSQL so metadata extraction, limit injection
+    and cache keys reuse its facts instead of parsing again. Raises
+    ValueError when the SQL is rejected.
+    """
+    parsed = parse_sql(sql, dialect)
 
-    # 1️⃣ Allow SELECT and WITH only
-    if not sql_l.startswith(("select", "with")):
-        raise ValueError("Only read-only queries are allowed")
+    if not parsed.is_read_only:
+        raise ValueError(parsed.read_only_error)
 
-    # 2️⃣ Block destructive operations
-    for kw in FORBIDDEN:
-        if re.search(rf"\b{kw}\b", sql_l):
-            raise ValueError(f"Forbidden operation: {kw}")
+    return parsed
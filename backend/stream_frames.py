@@ -0,0 +1,64 @@
+import datetime
+import json
+import math
+from decimal import Decimal
+
+
+# Structured chat streams, chosen by the request's Accept header. Anything
+# else gets the plain text stream (Markdown with __META__ frames).
+# Frame types: meta, columns, rows, insight, done, error.
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def stream_format(accept: str | None) -> str | None:
+    """
+    "ndjson", "sse" or None (plain text) for an Accept header.
+    """
+    accept = (accept or "").lower()
+    if NDJSON_MEDIA_TYPE in accept:
+        return "ndjson"
+    if SSE_MEDIA_TYPE in accept:
+        return "sse"
+    return None
+
+
+def media_type(fmt: str | None) -> str:
+    if fmt == "ndjson":
+        return NDJSON_MEDIA_TYPE
+    if fmt == "sse":
+        return SSE_MEDIA_TYPE
+    return "text/plain"
+
+
+def json_value(value):
+    """
+    JSON-safe cell value. Decimals stay exact (as text), dates become ISO
+    strings and bytes a size marker; NaN / inf are not valid JSON.
+    """
+    if value is None or isinstance(value, (bool, int, str)):
+        return value
+    if isinstance(value, float):
+        return value if math.isfinite(value) else str(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return f"<{len(value)} bytes>"
+    return str(value)
+
+
+def encode_frame(fmt: str, frame_type: str, **payload) -> str:
+    """
+    One typed frame: a JSON line (NDJSON) or an SSE event named after the
+    frame type, with the same JSON as data.
+    """
+    data = json.dumps({"type": frame_type, **payload}, separators=(",", ":"))
+    if fmt == "sse":
+        return f"event: {frame_type}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+def rows_frame(fmt: str, rows) -> str:
+    return encode_frame(fmt, "rows", rows=[[json_value(v) for v in row] for row in rows])
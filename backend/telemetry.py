@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# DEBUG / INFO / WARNING / ERROR, or OFF to silence the pipeline log
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# bearer token scrapers send to /metrics; unset keeps the endpoint disabled
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+# latency buckets (seconds) shared by all stage histograms
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger("sqlr")
+
+if LOG_LEVEL == "OFF":
+    logger.disabled = True
+else:
+    if LOG_LEVEL not in logging.getLevelNamesMapping():
+        logging.getLogger(__name__).warning("unknown LOG_LEVEL %r, using INFO", LOG_LEVEL)
+        LOG_LEVEL = "INFO"
+    logger.setLevel(LOG_LEVEL)
+    if not logger.handlers:
+        _handler = logging.StreamHandler()
+        _handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"
+        ))
+        logger.addHandler(_handler)
+        logger.propagate = False
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(labelnames, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(labelnames, values)]
+    pairs.extend(f'{n}="{_escape(v)}"' for n, v in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """
+    Monotonic counter with labels, rendered in the Prometheus text format.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_label_text(self.labelnames, key)} {value:g}"
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with labels (Prometheus text format).
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                labels = _label_text(self.labelnames, key, [("le", f"{bound:g}")])
+                yield f"{self.name}_bucket{labels} {count}"
+            labels = _label_text(self.labelnames, key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {values[-1]}"
+            yield f"{self.name}_sum{_label_text(self.labelnames, key)} {values[-2]:g}"
+            yield f"{self.name}_count{_label_text(self.labelnames, key)} {values[-1]}"
+
+
+registry = []
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+stage_seconds = Histogram(
+    "sqlr_stage_duration_seconds",
+    "Chat pipeline stage latency",
+    ("stage", "db")
+)
+llm_tokens = Counter(
+    "sqlr_llm_tokens_total",
+    "LLM tokens reported by the provider",
+    ("stage", "direction")
+)
+rows_fetched = Counter(
+    "sqlr_rows_fetched_total",
+    "Rows fetched from target databases",
+    ("db",)
+)
+cache_events = Counter(
+    "sqlr_cache_events_total",
+    "Cache lookups by cache and result",
+    ("cache", "result")
+)
+speculative_results = Counter(
+    "sqlr_speculative_sql_total",
+    "Speculative SQL generation races by winning branch",
+    ("winner",)
+)
+sql_candidate_results = Counter(
+    "sqlr_sql_candidates_total",
+    "Parallel SQL candidates by outcome",
+    ("outcome",)
+)
+queries_total = Counter(
+    "sqlr_queries_total",
+    "Target database queries by outcome",
+    ("outcome",)
+)
+template_answers = Counter(
+    "sqlr_template_answers_total",
+    "Answers rendered from a template (hit) or left to the LLM (miss)",
+    ("result",)
+)
+
+
+def record_llm_usage(stage: str, message):
+    """
+    Adds the provider's token counts (LangChain usage_metadata) for `stage`.
+    Messages without usage metadata are ignored.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    llm_tokens.inc(usage.get("input_tokens", 0), stage=stage, direction="input")
+    llm_tokens.inc(usage.get("output_tokens", 0), stage=stage, direction="output")
+
+
+class RequestTrace:
+    """
+    Per-request timing spans. Every span is observed into the stage
+    histogram (labelled with the database) and kept for the summary line.
+    """
+
+    def __init__(self, db: str):
+        self.db = db
+        self.stages = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+            stage_seconds.observe(elapsed, stage=stage, db=self.db)
+            logger.debug("stage %s took %.1f ms", stage, elapsed * 1000)
+
+    def log_summary(self, outcome: str):
+        logger.info(
+            "chat db=%s outcome=%s %s",
+            self.db,
+            outcome,
+            " ".join(f"{stage}={secs * 1000:.0f}ms" for stage, secs in self.stages.items())
+        )
@@ -0,0 +1,11 @@
+"""
+Keeps the app's auth database in memory and gives the modules that read
+secrets at import time throwaway values.
+"""
+import os
+
+
+os.environ["AUTH_DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("DB_SECRET_KEY", "kHB6GX0ihJvFHgjCPnd6pALhiBbSpAz4VZ5q28_ZSbo=")
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
@@ -0,0 +1,158 @@
+"""
+Keyset pagination and SQL extraction from stored assistant messages.
+
+Run from the backend folder:
+    python -m pytest tests
+"""
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from chat_utils import MAX_PAGE_SIZE, keyset_page, message_sql
+from database import Base
+from model import ChatMessage, ChatSession, User
+from response_formatter import format_static_response
+
+
+T0 = datetime.datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    session.add(User(id=1, username="u", hashed_password="x"))
+    session.add_all([ChatSession(id=1, user_id=1), ChatSession(id=2, user_id=1)])
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_messages(db, session_id, timestamps):
+    messages = [
+        ChatMessage(session_id=session_id, role="user", content="q", created_at=ts)
+        for ts in timestamps
+    ]
+    db.add_all(messages)
+    db.commit()
+    return [m.id for m in messages]
+
+
+def page(db, session_id, before_id, limit):
+    scope = ChatMessage.session_id == session_id
+    query = db.query(ChatMessage).filter(scope)
+    return [m.id for m in keyset_page(query, ChatMessage, before_id, limit, scope)]
+
+
+def walk(db, session_id, limit):
+    ids, before_id = [], None
+    while True:
+        batch = page(db, session_id, before_id, limit)
+        if not batch:
+            return ids
+        ids.extend(batch)
+        before_id = batch[-1]
+
+
+def test_first_page_is_newest_first(db):
+    ids = add_messages(db, 1, [T0 + datetime.timedelta(seconds=i) for i in range(5)])
+
+    assert page(db, 1, None, 2) == [ids[4], ids[3]]
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 10])
+def test_pages_cover_equal_timestamps_without_gaps_or_repeats(db, limit):
+    second = T0 + datetime.timedelta(seconds=1)
+    ids = add_messages(db, 1, [T0, second, T0, second, T0, T0])
+
+    expected = sorted(ids, key=lambda i: (db.get(ChatMessage, i).created_at, i), reverse=True)
+    assert walk(db, 1, limit) == expected
+
+
+def test_cursor_inside_a_run_of_equal_timestamps(db):
+    ids = add_messages(db, 1, [T0] * 4)
+
+    # same created_at: the id breaks the tie
+    assert page(db, 1, ids[2], 10) == [ids[1], ids[0]]
+
+
+def test_last_page_is_short_then_empty(db):
+    ids = add_messages(db, 1, [T0 + datetime.timedelta(seconds=i) for i in range(5)])
+
+    assert page(db, 1, ids[1], 3) == [ids[0]]
+    assert page(db, 1, ids[0], 3) == []
+
+
+def test_unknown_or_foreign_cursor_gives_empty_page(db):
+    add_messages(db, 1, [T0, T0])
+    other = add_messages(db, 2, [T0])
+
+    assert page(db, 1, 999, 10) == []
+    # a cursor from another session is not usable in this one
+    assert page(db, 1, other[0], 10) == []
+
+
+def test_static_response_sql_is_extracted():
+    sql = "SELECT albums.Title\nFROM albums\nWHERE albums.AlbumId < 10"
+    content = format_static_response(
+        db_name="chinook",
+        dialect="sqlite",
+        sql=sql,
+        tables=["albums"],
+        columns=["Title"],
+        rows=[("For Those About To Rock",)],
+        total_rows=1,
+    ) + "\n\n### Insights\n\n```sql\nSELECT 1\n```"
+
+    assert message_sql(content) == sql
+
+
+@pytest.mark.parametrize("content", [
+    None,
+    "",
+    "Sorry, the database did not respond.",
+    # empty results / NOT_ANSWERABLE keep the SQL as text, not as a result block
+    "There is no data available in the database.\n\nSQL Query:\n```sql\nSELECT 1",
+    "### SQL Query\n```python\nprint(1)\n```",
+])
+def test_messages_without_a_result_table_have_no_sql(content):
+    assert message_sql(content) is None
+
+
+@pytest.fixture
+def client(session_factory):
+    import main
+
+    def auth_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    main.app.dependency_overrides[main.get_auth_db] = auth_db
+    main.app.dependency_overrides[main.get_current_user] = lambda: 1
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
+
+
+@pytest.mark.parametrize("path", ["/chat/sessions", "/chat/1/messages"])
+def test_limit_is_validated(client, db, path):
+    assert client.get(path, params={"limit": MAX_PAGE_SIZE}).status_code == 200
+    assert client.get(path, params={"limit": MAX_PAGE_SIZE + 1}).status_code == 422
+    assert client.get(path, params={"limit": 0}).status_code == 422
@@ -0,0 +1,114 @@
+"""
+Row limit injection (sql_rewriter) and the read-only check (sql_validator).
+
+Run from the backend folder:
+    python -m pytest tests
+"""
+import pytest
+
+from sql_parse_cache import parse_sql
+from sql_rewriter import apply_row_limit, dry_run_sql
+from sql_validator import validate_sql
+
+
+DIALECTS = ["sqlite", "postgresql", "mysql", "mssql"]
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    ("sqlite", "SELECT a FROM t LIMIT 100"),
+    ("postgresql", "SELECT a FROM t LIMIT 100"),
+    ("mysql", "SELECT a FROM t LIMIT 100"),
+    ("mssql", "SELECT TOP 100 a FROM t"),
+])
+def test_limit_is_injected_in_the_dialect_form(dialect, expected):
+    assert apply_row_limit("SELECT a FROM t", dialect, 100) == expected
+
+
+@pytest.mark.parametrize("sql, dialect, expected", [
+    # an OFFSET without FETCH takes FETCH FIRST, not TOP
+    ("SELECT a FROM t ORDER BY a OFFSET 10 ROWS", "mssql",
+     "SELECT a FROM t ORDER BY a OFFSET 10 ROWS FETCH FIRST 100 ROWS ONLY"),
+    ("WITH c AS (SELECT a FROM t) SELECT a FROM c", "mssql",
+     "WITH c AS (SELECT a AS a FROM t) SELECT TOP 100 a FROM c"),
+    ("SELECT DISTINCT a FROM t", "mysql", "SELECT DISTINCT a FROM t LIMIT 100"),
+])
+def test_limit_fits_the_query_shape(sql, dialect, expected):
+    assert apply_row_limit(sql, dialect, 100) == expected
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    ("sqlite", "SELECT a FROM t UNION SELECT a FROM u LIMIT 100"),
+    ("postgresql", "SELECT a FROM t UNION SELECT a FROM u LIMIT 100"),
+    # TOP cannot follow a set operation: the union is wrapped
+    ("mssql", "SELECT TOP 100 * FROM (SELECT a FROM t UNION SELECT a FROM u) AS _l_0"),
+])
+def test_union_is_limited_as_a_whole(dialect, expected):
+    assert apply_row_limit("SELECT a FROM t UNION SELECT a FROM u", dialect, 100) == expected
+
+
+@pytest.mark.parametrize("sql, dialect", [
+    # existing limits are the user's, above or below the budget
+    ("SELECT a FROM t LIMIT 10", "sqlite"),
+    ("SELECT a FROM t LIMIT 5000", "postgresql"),
+    ("SELECT a FROM t LIMIT 10 OFFSET 5", "mysql"),
+    ("SELECT a FROM t LIMIT ?", "sqlite"),
+    ("SELECT TOP 5000 a FROM t", "mssql"),
+    ("SELECT a FROM t ORDER BY a OFFSET 0 ROWS FETCH NEXT 5000 ROWS ONLY", "mssql"),
+    # aggregates and constant selects return few rows anyway
+    ("SELECT COUNT(*) FROM t", "sqlite"),
+    ("SELECT a, COUNT(*) FROM t GROUP BY a", "postgresql"),
+    ("SELECT 'NOT_ANSWERABLE'", "sqlite"),
+    # unparseable SQL is passed through for the database to reject
+    ("SELEC a FRM t", "sqlite"),
+])
+def test_sql_is_left_alone(sql, dialect):
+    assert apply_row_limit(sql, dialect, 100) == sql
+
+
+def test_cached_parse_is_reused():
+    parsed = validate_sql("SELECT a FROM t", "postgresql")
+
+    assert apply_row_limit("SELECT a FROM t", "postgresql", 100, parsed) == "SELECT a FROM t LIMIT 100"
+    assert parse_sql("SELECT a FROM t", "postgresql") is parsed
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    ("sqlite", "EXPLAIN QUERY PLAN SELECT a FROM t"),
+    ("postgresql", "EXPLAIN SELECT a FROM t"),
+    ("mssql", "SELECT TOP 0 a FROM t"),
+])
+def test_dry_run(dialect, expected):
+    assert dry_run_sql("SELECT a FROM t", dialect) == expected
+
+
+@pytest.mark.parametrize("dialect", DIALECTS)
+@pytest.mark.parametrize("sql", [
+    "SELECT updated_at, deleted_by FROM t",
+    "SELECT 'delete me' AS note FROM t WHERE name = 'DROP TABLE t'",
+    "WITH recent AS (SELECT a FROM t) SELECT a FROM recent",
+    "SELECT a FROM t UNION SELECT a FROM u",
+])
+def test_read_only_queries_are_accepted(sql, dialect):
+    assert validate_sql(sql, dialect).is_read_only
+
+
+@pytest.mark.parametrize("sql, dialects, error", [
+    ("SELECT 1; SELECT 2", DIALECTS, "single SQL statement"),
+    ("SELECT a FROM t; DROP TABLE t", DIALECTS, "single SQL statement"),
+    ("WITH x AS (DELETE FROM t RETURNING *) SELECT * FROM x", ["sqlite", "postgresql"],
+     "Forbidden operation: delete"),
+    ("SELECT * FROM t FOR UPDATE", ["sqlite", "postgresql", "mysql"], "Forbidden operation: lock"),
+    ("SELECT * INTO t2 FROM t", DIALECTS, "Forbidden operation: into"),
+    ("PRAGMA table_info(t)", ["sqlite"], "read-only"),
+    ("UPDATE t SET a = 1", DIALECTS, "read-only"),
+    ("DROP TABLE t", DIALECTS, "read-only"),
+])
+def test_writes_and_multiple_statements_are_rejected(sql, dialects, error):
+    for dialect in dialects:
+        with pytest.raises(ValueError, match=error):
+            validate_sql(sql, dialect)
+
+
+def test_unparseable_sql_is_rejected():
+    with pytest.raises(ValueError, match="Could not parse"):
+        validate_sql("SELEC a FRM t", "sqlite")
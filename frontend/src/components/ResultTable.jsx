@@ -0,0 +1,57 @@
+// Query result rendered from streamed row frames; grows as batches arrive.
+const MAX_VISIBLE_ROWS = 200;
+
+const cell = (value) => (value === null ? "NULL" : String(value));
+
+export default function ResultTable({ columns, rows, totalRows, done }) {
+  if (!columns.length) return null;
+
+  if (done && !rows.length) {
+    return <p className="mb-3 italic">No rows returned</p>;
+  }
+
+  const visible = rows.slice(0, MAX_VISIBLE_ROWS);
+
+  let footer = null;
+  if (!done) {
+    footer = `Loading… ${rows.length} rows so far`;
+  } else if (totalRows === null) {
+    footer = `Showing first ${visible.length} of more than ${rows.length} rows. Refine your question to see more specific results.`;
+  } else if (totalRows > visible.length) {
+    footer = `Showing first ${visible.length} of ${totalRows} rows. Refine your question to see more specific results.`;
+  }
+
+  return (
+    <div className="my-3">
+      <div className="overflow-x-auto max-h-96 overflow-y-auto">
+        <table className="min-w-max border-collapse text-sm">
+          <thead>
+            <tr>
+              {columns.map((c) => (
+                <th
+                  key={c}
+                  className="sticky top-0 border border-gray-300 bg-gray-100 px-3 py-2 text-left font-semibold whitespace-nowrap"
+                >
+                  {c}
+                </th>
+              ))}
+            </tr>
+          </thead>
+          <tbody>
+            {visible.map((row, i) => (
+              <tr key={i}>
+                {row.map((v, j) => (
+                  <td key={j} className="border border-gray-300 px-3 py-2 whitespace-nowrap">
+                    {cell(v)}
+                  </td>
+                ))}
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      </div>
+
+      {footer && <p className="mt-2 text-sm italic text-gray-600">{footer}</p>}
+    </div>
+  );
+}
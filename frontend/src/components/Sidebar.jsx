@@ -8,7 +8,9 @@ export default function Sidebar({
   onNewChat,
   onDelete,
   onAddDatabase,
-  onClose
+  onClose,
+  hasMore,
+  onLoadMore
 })
 
 {
@@ -74,6 +76,15 @@ export default function Sidebar({
               </button>
             </div>
           ))}
+
+          {hasMore && (
+            <button
+              onClick={onLoadMore}
+              className="w-full px-2 py-1 text-sm text-gray-500 hover:text-black"
+            >
+              Load more
+            </button>
+          )}
         </div>
       </div>
 
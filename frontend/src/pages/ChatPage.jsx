@@ -8,7 +8,8 @@ import {
   getSessions,
   getMessages,
   deleteSession,
-  streamChatMessage
+  streamChatMessage,
+  PAGE_SIZE
 } from "../services/chat";
 
 export default function ChatPage() {
@@ -19,6 +20,8 @@ export default function ChatPage() {
   const [showNewChat, setShowNewChat] = useState(false);
   const [sidebarOpen, setSidebarOpen] = useState(true);
   const [isStreaming, setIsStreaming] = useState(false);
+  const [hasMoreSessions, setHasMoreSessions] = useState(false);
+  const [hasMoreMessages, setHasMoreMessages] = useState(false);
 
 
   useEffect(() => {
@@ -44,10 +47,19 @@ export default function ChatPage() {
   const loadSessions = async () => {
     const res = await getSessions();
     setSessions(res.data);
+    setHasMoreSessions(res.data.length === PAGE_SIZE);
+  };
+
+  // next (older) page of sessions, appended below the loaded ones
+  const loadMoreSessions = async () => {
+    const res = await getSessions(sessions[sessions.length - 1]?.id);
+    setSessions(prev => [...prev, ...res.data]);
+    setHasMoreSessions(res.data.length === PAGE_SIZE);
   };
 
   const loadMessages = async () => {
     const res = await getMessages(currentSession.id);
+    setHasMoreMessages(res.data.length === PAGE_SIZE);
     setMessages(prev => {
       const map = new Map();
 
@@ -59,6 +71,14 @@ export default function ChatPage() {
     });
   };
 
+  // previous page of history, prepended above the loaded messages
+  const loadEarlierMessages = async () => {
+    const oldest = messages.find(m => typeof m.id === "number");
+    const res = await getMessages(currentSession.id, oldest?.id);
+    setHasMoreMessages(res.data.length === PAGE_SIZE);
+    setMessages(prev => [...res.data, ...prev]);
+  };
+
   /* -------------------- ACTIONS -------------------- */
 
   const newChat = () => {
@@ -72,6 +92,8 @@ export default function ChatPage() {
   };
 
   const selectSession = (session) => {
+    // history is paged per session, so don't carry messages over
+    if (session.id !== currentSession?.id) setMessages([]);
     setCurrentSession(session);
   };
 
@@ -93,59 +115,66 @@ export default function ChatPage() {
     setMessages((prev) => [...prev, userMsg, assistantMsg]);
     setIsStreaming(true);
 
-    let assistantText = "";
+    const applyMeta = (meta) => {
+      if (!meta.session_title) return;
+
+      setSessions(prev =>
+        prev.map(s =>
+          s.id === currentSession.id
+            ? { ...s, title: meta.session_title }
+            : s
+        )
+      );
+
+      setCurrentSession(s => ({
+        ...s,
+        title: meta.session_title
+      }));
+    };
 
+    // patch the streaming assistant message (always the last one)
+    const update = (patch) => {
+      setMessages((prev) => {
+        const updated = [...prev];
+        const last = updated[updated.length - 1];
+        updated[updated.length - 1] = { ...last, ...patch(last) };
+        return updated;
+      });
+    };
 
     await streamChatMessage(
       currentSession.id,
       text,
-      (chunk,meta) => {
-        console.log("stream meta:",meta)
-        
-        if (chunk.includes("__META__")) {
-          const [metaPart, rest] = chunk.split("__END_META__");
-
-          try {
-            const meta = JSON.parse(
-              metaPart.replace("__META__", "").trim()
-            );
-
-            if (meta.session_title) {
-              setSessions(prev =>
-                prev.map(s =>
-                  s.id === currentSession.id
-                    ? { ...s, title: meta.session_title }
-                    : s
-                )
-              );
-
-              setCurrentSession(s => ({
-                ...s,
-                title: meta.session_title
-              }));
-            }
-          } catch (e) {
-            console.error("META parse failed:", e, metaPart);
-          }
-
-          if (!rest) return;
-          chunk = rest;
+      (frame) => {
+        switch (frame.type) {
+          case "meta":
+            // first frame carries the query header, a later one the LLM title
+            applyMeta(frame);
+            if (frame.sql) update(() => ({ result: { meta: frame, columns: [], rows: [] } }));
+            break;
+          case "columns":
+            update((m) => ({ result: { ...m.result, columns: frame.columns } }));
+            break;
+          case "rows":
+            update((m) => ({ result: { ...m.result, rows: [...m.result.rows, ...frame.rows] } }));
+            break;
+          case "insight":
+            update((m) => ({ content: m.content + frame.text }));
+            break;
+          case "error":
+            update((m) => ({ content: m.content + frame.message }));
+            break;
+          case "done":
+            update((m) => m.result
+              ? { result: { ...m.result, totalRows: frame.total_rows, done: true } }
+              : {});
+            break;
+          default:
+            break;
         }
-
-        assistantText += chunk;
-
-        setMessages((prev) => {
-          const updated = [...prev];
-          updated[updated.length - 1] = {
-            ...updated[updated.length - 1],
-            content: assistantText
-          };
-
-          return updated;
-        });
       }
     );
-  
+
     setIsStreaming(false);
   };
 
@@ -201,6 +230,8 @@ export default function ChatPage() {
         onDelete={deleteChat}
         onAddDatabase={() => setShowAddDb(true)}
         onClose={()=>setSidebarOpen(false)}
+        hasMore={hasMoreSessions}
+        onLoadMore={loadMoreSessions}
       />
     </div>
   )}
@@ -224,6 +255,16 @@ export default function ChatPage() {
           </div>
         ) : (
           <div className="mx-auto w-full max-w-4xl px-4 md:px-6">
+            {hasMoreMessages && (
+              <div className="flex justify-center pt-4">
+                <button
+                  onClick={loadEarlierMessages}
+                  className="text-sm text-gray-500 hover:text-black"
+                >
+                  Load earlier messages
+                </button>
+              </div>
+            )}
             <ChatWindow messages={messages} isStreaming={isStreaming}/>
           </div>
         )}
@@ -1,10 +1,14 @@
 import api from "./api";
 
-export const getSessions=()=>api.get("/chat/sessions");
+// keyset pages: pass the oldest id already loaded as beforeId for the next page
+export const PAGE_SIZE=50;
+
+export const getSessions=(beforeId)=>
+    api.get("/chat/sessions",{params:{limit:PAGE_SIZE,before_id:beforeId}});
 export const createSession=(dbId)=>api.post("/chat/sessions",{title:"New Chat",db_id:dbId});
 
-export const getMessages=(sessionId) =>
-    api.get(`/chat/${sessionId}/messages`);
+export const getMessages=(sessionId,beforeId) =>
+    api.get(`/chat/${sessionId}/messages`,{params:{limit:PAGE_SIZE,before_id:beforeId}});
 
 export const sendMessage=(sessionId,message) =>
     api.post(`/chat/${sessionId}/messages`,{message});
@@ -22,7 +26,9 @@ export const testDatabase=(payload)=>
     api.post("/databases/test",payload)
 
 
-export async function streamChatMessage(sessionId, message, onChunk) {
+// Structured stream: one JSON frame per line (meta, columns, rows,
+// insight, done, error); rows arrive while the query is still being read.
+export async function streamChatMessage(sessionId, message, onFrame) {
   const token = localStorage.getItem("token");
 
   const res = await fetch(
@@ -32,6 +38,7 @@ export async function streamChatMessage(sessionId, message, onChunk) {
       headers: {
         "Authorization": `Bearer ${token}`,
         "Content-Type": "application/json",
+        "Accept": "application/x-ndjson",
       },
       body: JSON.stringify({ message }),
     }
@@ -44,15 +51,30 @@ export async function streamChatMessage(sessionId, message, onChunk) {
   const reader = res.body.getReader();
   const decoder = new TextDecoder("utf-8");
 
+  let pending = "";
   let done = false;
 
+  const emit = (line) => {
+    if (!line.trim()) return;
+    try {
+      onFrame(JSON.parse(line));
+    } catch (e) {
+      console.error("Frame parse failed:", e, line);
+    }
+  };
+
   while (!done) {
     const { value, done: doneReading } = await reader.read();
     done = doneReading;
 
     if (value) {
-      const chunk = decoder.decode(value, { stream: true });
-      onChunk(chunk);
+      // frames may be split across chunks: keep the unfinished last line
+      pending += decoder.decode(value, { stream: true });
+      const lines = pending.split("\n");
+      pending = lines.pop();
+      lines.forEach(emit);
     }
   }
+
+  emit(pending + decoder.decode());
 }